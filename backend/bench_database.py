@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Database connection manager.
+
+Measures requests per second for the /api/keywords read path and the
+/api/update-position write path under concurrent load, once with the old
+connect-per-call rollback-journal setup and once with reused WAL connections.
+
+    python bench_database.py                  # Database methods from N threads
+    python bench_database.py --http           # real HTTP requests against the FastAPI app
+    python bench_database.py --threads 16 --seconds 10 --keywords 2000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from database import Database
+
+
+def seed(db, keyword_count, history_per_keyword):
+    ids = []
+    for i in range(keyword_count):
+        ids.append(db.add_keyword(f"keyword {i}", f"https://example.com/page-{i}", 'us', None, f"client {i % 10}"))
+    db.add_position_checks([
+        {"keyword_id": keyword_id, "position": random.randint(1, 100)}
+        for keyword_id in ids
+        for _ in range(history_per_keyword)
+    ])
+    return ids
+
+
+def run_load(threads, seconds, operation):
+    """Call operation() from `threads` threads for `seconds`; returns completed calls per second"""
+    stop_at = time.monotonic() + seconds
+    counts = [0] * threads
+
+    def worker(n):
+        while time.monotonic() < stop_at:
+            operation()
+            counts[n] += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    return sum(counts) / (time.monotonic() - started)
+
+
+def bench_methods(db, keyword_ids, args):
+    reads = run_load(args.threads, args.seconds, lambda: db.get_all_keywords())
+    writes = run_load(args.threads, args.seconds,
+                      lambda: db.add_position_check(random.choice(keyword_ids), random.randint(1, 100)))
+    return reads, writes
+
+
+def bench_http(db, keyword_ids, args):
+    import uvicorn
+    import main
+
+    main.db = db
+    token = main.create_access_token({"sub": main.ADMIN_USERNAME})
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{port}"
+
+    def get_keywords():
+        request = urllib.request.Request(f"{base}/api/keywords", headers=headers)
+        with urllib.request.urlopen(request) as response:
+            response.read()
+
+    def update_position():
+        body = json.dumps({"keyword_id": random.choice(keyword_ids), "position": random.randint(1, 100)}).encode()
+        request = urllib.request.Request(f"{base}/api/update-position", data=body, headers=headers, method='POST')
+        with urllib.request.urlopen(request) as response:
+            response.read()
+
+    try:
+        reads = run_load(args.threads, args.seconds, get_keywords)
+        writes = run_load(args.threads, args.seconds, update_position)
+    finally:
+        server.should_exit = True
+        thread.join()
+    return reads, writes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--http', action='store_true', help='benchmark through the FastAPI app instead of Database methods')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--keywords', type=int, default=500)
+    parser.add_argument('--history', type=int, default=20, help='position_history rows per keyword')
+    args = parser.parse_args()
+
+    bench = bench_http if args.http else bench_methods
+    target = 'HTTP' if args.http else 'Database methods'
+    print(f"{target}: {args.threads} threads, {args.seconds}s per run, "
+          f"{args.keywords} keywords x {args.history} history rows")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, reuse in (('before (connect per call)', False), ('after (reused WAL connections)', True)):
+            db = Database(os.path.join(tmp, f"bench_{int(reuse)}.db"), reuse_connections=reuse)
+            keyword_ids = seed(db, args.keywords, args.history)
+            results[label] = bench(db, keyword_ids, args)
+            db.close()
+
+    print(f"{'':32} {'/api/keywords':>16} {'/api/update-position':>22}")
+    for label, (reads, writes) in results.items():
+        print(f"{label:32} {reads:>12.1f} rps {writes:>18.1f} rps")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
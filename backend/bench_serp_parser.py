@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the offline SERP parser.
+
+Parses every page in fixtures/serp/ repeatedly and reports pages per second,
+plus memory per page: the Python heap peak while parsing one page (tracemalloc)
+and, with psutil installed, the process RSS growth over the whole run, which
+also covers the Lexbor parser's native allocations.
+
+    python bench_serp_parser.py
+    python bench_serp_parser.py --seconds 10 --fixtures path/to/dumps
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from serp_parser import FIXTURE_DIR, load_fixtures, extract_organic_urls
+
+
+def rss_mb():
+    """Resident memory of this process, or None without psutil"""
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURE_DIR, help='directory of saved SERP .html files')
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    pages = [(name, html) for name, html, _ in load_fixtures(args.fixtures)]
+    if not pages:
+        print(f"No .html fixtures in {args.fixtures}")
+        return 1
+
+    total_kb = sum(len(html.encode('utf-8')) for _, html in pages) / 1024
+    print(f"{len(pages)} page(s), {total_kb:.0f} KB total, {args.seconds}s run")
+
+    # Warm up so one-off import and parser setup costs are not charged to the first page
+    extract_organic_urls(pages[0][1])
+
+    # Per-page Python heap peak, measured separately so tracing does not slow the timed run
+    print(f"\n{'page':40} {'KB':>8} {'results':>8} {'heap peak KB':>14}")
+    for name, html in pages:
+        tracemalloc.start()
+        urls = extract_organic_urls(html)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name[:40]:40} {len(html.encode('utf-8')) / 1024:>8.0f} {len(urls):>8} {peak / 1024:>14.0f}")
+
+    rss_before = rss_mb()
+    parsed = 0
+    parsed_bytes = 0
+    started = time.perf_counter()
+    stop_at = started + args.seconds
+    while time.perf_counter() < stop_at:
+        for _, html in pages:
+            extract_organic_urls(html)
+            parsed += 1
+            parsed_bytes += len(html)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{parsed / elapsed:.1f} pages/s ({parsed_bytes / elapsed / (1024 * 1024):.1f} MB/s of HTML), "
+          f"{elapsed / parsed * 1000:.2f} ms per page")
+    rss_after = rss_mb()
+    if rss_after is None:
+        print("RSS not measured (pip install psutil)")
+    else:
+        print(f"RSS {rss_after:.1f} MB (+{rss_after - rss_before:.1f} MB during the timed run)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark for UrlMatcher against pairwise urls_match calls.
+
+Builds synthetic 100-result SERPs and target sets that exercise every
+matching rule (www, trailing slash, query and fragment, >80% substring,
+near misses and same-length URLs), checks that UrlMatcher.resolve returns
+exactly the positions of the pairwise loop, then times both.
+
+    python bench_url_matcher.py
+    python bench_url_matcher.py --targets 1,10,50 --serps 500 --seconds 3
+"""
+
+import sys
+import time
+import random
+import argparse
+
+from url_matcher import UrlMatcher, urls_match
+
+WORDS = ['bike', 'shop', 'repair', 'rental', 'trail', 'parts', 'guide', 'review', 'store', 'city']
+
+
+def random_url(rng):
+    host = f"{rng.choice(WORDS)}{rng.randint(1, 400)}.com"
+    path = '/'.join(rng.choice(WORDS) for _ in range(rng.randint(0, 3)))
+    return f"https://{host}/{path}"
+
+
+def variant(rng, url):
+    """The same page the way Google or a user might write it, or a near miss"""
+    kind = rng.randint(0, 6)
+    if kind == 0:
+        return url.replace('https://', 'https://www.')
+    if kind == 1:
+        return url.rstrip('/') + '/'
+    if kind == 2:
+        return f"{url}?utm_source=serp#top"
+    if kind == 3:
+        return url.rstrip('/') + '-x'  # longer by a little: substring rule
+    if kind == 4:
+        return url.rstrip('/') + '/' + rng.choice(WORDS) * 3  # longer by a lot: no match
+    if kind == 5:
+        return url[:-1] + ('z' if url[-1] != 'z' else 'y')  # same length, different URL
+    return url
+
+
+def make_case(rng, target_count, results=100):
+    serp = [random_url(rng) for _ in range(results)]
+    targets = []
+    for _ in range(target_count):
+        if rng.random() < 0.6:
+            targets.append(variant(rng, rng.choice(serp)))
+        else:
+            targets.append(random_url(rng))
+    return serp, targets
+
+
+def pairwise(serp, targets):
+    """The scraper's original loop: every result against every unfound target"""
+    found = {}
+    for position, url in enumerate(serp, 1):
+        for index, target in enumerate(targets):
+            if index not in found and urls_match(url, target):
+                found[index] = position
+    return found
+
+
+def compiled(serp, targets):
+    return UrlMatcher(targets).resolve(serp)
+
+
+def rate(func, cases, seconds):
+    done = 0
+    started = time.perf_counter()
+    stop_at = started + seconds
+    while time.perf_counter() < stop_at:
+        for serp, targets in cases:
+            func(serp, targets)
+            done += 1
+    return done / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', default='1,5,20,50', help='comma-separated target counts per SERP')
+    parser.add_argument('--serps', type=int, default=200, help='SERPs per target count')
+    parser.add_argument('--seconds', type=float, default=2, help='timed run per method and target count')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    counts = [int(count) for count in args.targets.split(',')]
+
+    # Equivalence first: a faster matcher that answers differently is a bug, not a speed-up
+    mismatches = 0
+    checked = 0
+    for count in counts:
+        for serp, targets in (make_case(rng, count) for _ in range(args.serps)):
+            expected = pairwise(serp, targets)
+            got = compiled(serp, targets)
+            checked += 1
+            if got != expected:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"!! mismatch for targets {targets}: expected {expected}, got {got}")
+    print(f"Self-check: {checked} SERP(s), {mismatches} mismatch(es)")
+    if mismatches:
+        return 1
+
+    print(f"\n{'targets':>8} {'pairwise/s':>12} {'matcher/s':>12} {'speed-up':>9}")
+    for count in counts:
+        cases = [make_case(rng, count) for _ in range(args.serps)]
+        slow = rate(pairwise, cases, args.seconds)
+        fast = rate(compiled, cases, args.seconds)
+        print(f"{count:>8} {slow:>12.0f} {fast:>12.0f} {fast / slow:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
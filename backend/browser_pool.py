@@ -0,0 +1,214 @@
+import os
+import time
+import logging
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """A warm Chrome driver plus the bookkeeping the pool needs to recycle it"""
+
+    def __init__(self, driver, key, cleanup=None):
+        self.driver = driver
+        self.key = key
+        self.cleanup = cleanup  # called once the driver has quit (proxy extension, profile)
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class BrowserPool:
+    """
+    Keeps warm undetected-chromedriver instances keyed by (proxy, country)
+    and lends them out one keyword at a time.
+
+    Drivers are recycled after `max_uses` searches, after a CAPTCHA, when
+    they fail a health check or when their process tree grows past
+    `max_memory_mb` (measured with psutil, which the cap requires; 0 turns
+    the cap off). At most `max_size` drivers exist at any time; callers
+    block in acquire() until one is free.
+    """
+
+    def __init__(self, max_size=None, max_uses=None, max_memory_mb=None, acquire_timeout=None):
+        self.max_size = max_size or int(os.getenv('BROWSER_POOL_SIZE', '2'))
+        self.max_uses = max_uses or int(os.getenv('BROWSER_MAX_USES', '25'))
+        self.max_memory_mb = max_memory_mb if max_memory_mb is not None else int(os.getenv('BROWSER_MAX_MEMORY_MB', '1024'))
+        self.acquire_timeout = acquire_timeout or float(os.getenv('BROWSER_ACQUIRE_TIMEOUT', '600'))
+
+        self._idle = {}  # key -> list of idle PooledDriver
+        self._total = 0  # idle + leased + being launched
+        self._cond = threading.Condition()
+        self._closed = False
+
+        if self.max_memory_mb and psutil is None:
+            raise RuntimeError(f"The browser memory cap ({self.max_memory_mb} MB) needs psutil: "
+                               f"pip install psutil, or set BROWSER_MAX_MEMORY_MB=0 to run without a cap")
+
+    @staticmethod
+    def make_key(proxy, country):
+        return (proxy or '', (country or '').lower())
+
+    def chrome_arguments(self):
+        """Extra Chrome flags that enforce the per-driver memory cap inside the browser"""
+        if not self.max_memory_mb:
+            return []
+        heap_mb = max(128, self.max_memory_mb // 2)
+        return [f'--js-flags=--max-old-space-size={heap_mb}']
+
+    def acquire(self, proxy, country, factory):
+        """
+        Borrow a driver for (proxy, country).
+
+        factory() is called when a new driver is needed and must return
+        (driver, cleanup), cleanup being None or a callable to run after the
+        driver quits. Returns a PooledDriver that has to be handed back with
+        release().
+        """
+        key = self.make_key(proxy, country)
+        deadline = time.time() + self.acquire_timeout
+
+        while True:
+            entry = None
+            evicted = None
+            launch = False
+
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed")
+
+                    idle = self._idle.get(key)
+                    if idle:
+                        entry = idle.pop()
+                        break
+
+                    if self._total < self.max_size:
+                        self._total += 1
+                        launch = True
+                        break
+
+                    # Pool is full: make room by evicting an idle driver for another key
+                    evicted = self._pop_idle_other(key)
+                    if evicted:
+                        launch = True
+                        break
+
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No browser available after {self.acquire_timeout}s")
+                    self._cond.wait(remaining)
+
+            if evicted:
+                logger.info("Evicting idle browser to make room for another proxy/country")
+                self._close_driver(evicted)
+
+            if entry:
+                if self._is_healthy(entry):
+                    logger.info(f"Reusing warm browser (use {entry.uses + 1}/{self.max_uses})")
+                    return entry
+                logger.warning("Pooled browser failed health check, replacing it")
+                self._discard(entry)
+                continue
+
+            if launch:
+                try:
+                    driver, cleanup = factory()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                logger.info(f"Launched pooled browser ({self._total}/{self.max_size} in pool)")
+                return PooledDriver(driver, key, cleanup)
+
+    def release(self, entry, captcha=False, broken=False):
+        """Return a driver to the pool, recycling it if it hit one of the limits"""
+        entry.uses += 1
+
+        reason = None
+        if broken:
+            reason = "session error"
+        elif captcha:
+            reason = "CAPTCHA seen"
+        elif entry.uses >= self.max_uses:
+            reason = f"reached {self.max_uses} searches"
+        else:
+            memory_mb = self._memory_mb(entry)
+            if memory_mb is not None and self.max_memory_mb and memory_mb > self.max_memory_mb:
+                reason = f"using {memory_mb:.0f} MB (cap {self.max_memory_mb} MB)"
+
+        if reason or self._closed:
+            if reason:
+                logger.info(f"Recycling browser: {reason}")
+            self._discard(entry)
+            return
+
+        with self._cond:
+            self._idle.setdefault(entry.key, []).append(entry)
+            self._cond.notify()
+
+    def close(self):
+        """Quit every idle driver and refuse new leases"""
+        with self._cond:
+            self._closed = True
+            entries = [e for idle in self._idle.values() for e in idle]
+            self._idle.clear()
+            self._cond.notify_all()
+
+        for entry in entries:
+            self._discard(entry)
+
+    def _pop_idle_other(self, key):
+        for other_key, idle in self._idle.items():
+            if other_key != key and idle:
+                return idle.pop(0)
+        return None
+
+    def _discard(self, entry):
+        self._close_driver(entry)
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def _close_driver(self, entry):
+        try:
+            entry.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error during browser cleanup: {e}")
+
+        if entry.cleanup:
+            try:
+                entry.cleanup()
+            except Exception as e:
+                logger.warning(f"Error releasing browser resources: {e}")
+
+    def _is_healthy(self, entry):
+        try:
+            entry.driver.current_url
+            return bool(entry.driver.window_handles)
+        except Exception as e:
+            logger.debug(f"Health check failed: {e}")
+            return False
+
+    def _memory_mb(self, entry):
+        """Resident memory of the browser process tree, or None if it cannot be measured"""
+        pid = getattr(entry.driver, 'browser_pid', None)
+        if psutil is None or not pid:
+            return None
+
+        try:
+            process = psutil.Process(pid)
+            rss = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            return rss / (1024 * 1024)
+        except psutil.Error:
+            return None
@@ -0,0 +1,285 @@
+import os
+import time
+import shutil
+import socket
+import hashlib
+import logging
+import tempfile
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from proxy_pool import parse_proxy
+
+logger = logging.getLogger(__name__)
+
+# Inside a profile: caches Chrome rebuilds on its own, cleared first when compacting
+REGENERABLE_DIRS = (
+    'Crashpad',
+    'ShaderCache',
+    'GrShaderCache',
+    'GraphiteDawnCache',
+    'component_crx_cache',
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'DawnCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+    os.path.join('Default', 'Service Worker', 'ScriptCache'),
+)
+# The HTTP cache: worth keeping (static assets), but the first thing to go after the above
+HTTP_CACHE_DIR = os.path.join('Default', 'Cache')
+
+
+def pid_alive(pid):
+    """True if process `pid` runs on this machine; also True when that cannot be checked"""
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    if os.name != 'posix':
+        return True  # os.kill(pid, 0) is not a probe on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def dir_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total / (1024 * 1024)
+
+
+class ChromeProfilePool:
+    """
+    Persistent Chrome user-data-dirs, kept per proxy identity.
+
+    A session on a proxy gets a profile that earlier sessions on the same
+    proxy already used, so consent cookies, Google's cookies and cached
+    static assets carry over instead of every session looking like a new
+    visitor. Chrome can run only one browser per profile, so each identity
+    has numbered slots (<identity>-0, <identity>-1, ...) and a session takes
+    the lowest one that is free here and not locked by another processor.
+    A lease holds '<slot>.lock' next to the profile (created exclusively,
+    holding host and pid), so processors on the same machine never share a
+    slot on any platform. A lock whose process is gone is taken over; where
+    that cannot be checked (Windows without psutil) it is left alone and
+    another slot is used.
+
+    Chrome's HTTP cache is capped at `cache_mb`. Every `compact_every`
+    sessions, and whenever a released profile is over `max_mb`, the
+    profile is compacted: regenerable caches go first, then the HTTP
+    cache, and a profile still over `max_mb` is reset. Profiles of proxies
+    that are no longer configured are deleted by prune().
+    """
+
+    def __init__(self, root=None, enabled=None, cache_mb=None, max_mb=None, compact_every=None, grace=None):
+        self.root = root or os.getenv('CHROME_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'rank_tracker_chrome_profiles')
+        self.enabled = enabled if enabled is not None else os.getenv('CHROME_PROFILES', '1') == '1'
+        self.cache_mb = cache_mb or int(os.getenv('CHROME_PROFILE_CACHE_MB', '64'))
+        self.max_mb = max_mb or int(os.getenv('CHROME_PROFILE_MAX_MB', '256'))
+        self.compact_every = compact_every or int(os.getenv('CHROME_PROFILE_COMPACT_EVERY', '20'))
+        self.grace = grace if grace is not None else float(os.getenv('CHROME_PROFILE_GC_GRACE', '86400'))
+
+        self._in_use = set()  # profile paths leased in this process
+        self._sessions = {}  # path -> sessions since its last compaction
+        self._lock = threading.Lock()
+
+        self.compactions = 0
+        self.resets = 0
+
+    @staticmethod
+    def identity(proxy):
+        """Profile name prefix: a hash of the canonical proxy URL (credentials never in clear), or 'direct'"""
+        if not proxy:
+            return 'direct'
+        try:
+            proxy = parse_proxy(proxy).url
+        except ValueError:
+            pass
+        return hashlib.sha256(proxy.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _lock_path(path):
+        return f"{path}.lock"
+
+    def _take_lock(self, path):
+        """Create the profile's lock file for this process; False while another live process holds it"""
+        lock = self._lock_path(path)
+        for _ in range(2):
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._stale_lock(lock):
+                    return False
+                try:
+                    os.remove(lock)
+                except OSError:
+                    return False
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(f"{socket.gethostname()} {os.getpid()}")
+            return True
+        return False
+
+    @staticmethod
+    def _stale_lock(lock):
+        """True if the lock file's owner is gone (same host, process no longer running)"""
+        try:
+            with open(lock) as f:
+                host, _, pid = f.read().strip().rpartition(' ')
+            pid = int(pid)
+        except (OSError, ValueError):
+            return False  # being written right now, or unreadable: treat as held
+        return host == socket.gethostname() and pid != os.getpid() and not pid_alive(pid)
+
+    def _drop_lock(self, path):
+        try:
+            os.remove(self._lock_path(path))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _locked_elsewhere(path):
+        """True while another running Chrome holds the profile (Chrome's SingletonLock -> 'host-pid')"""
+        try:
+            target = os.readlink(os.path.join(path, 'SingletonLock'))
+        except OSError:
+            return False  # no lock, or a platform without the symlink
+        try:
+            os.kill(int(target.rpartition('-')[2]), 0)
+        except ProcessLookupError:
+            return False  # left behind by a browser that crashed; Chrome takes it over
+        except (ValueError, OSError):
+            pass
+        return True
+
+    def acquire(self, proxy):
+        """Lease a profile directory for a browser on `proxy`; release() it once the browser has quit"""
+        identity = self.identity(proxy)
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            slot = 0
+            while True:
+                path = os.path.join(self.root, f"{identity}-{slot}")
+                if path not in self._in_use and not self._locked_elsewhere(path) and self._take_lock(path):
+                    break
+                slot += 1
+            self._in_use.add(path)
+        os.makedirs(path, exist_ok=True)
+        try:
+            # The mtime marks the profile as recently used for prune()
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def chrome_arguments(self, path):
+        return [
+            f'--user-data-dir={path}',
+            f'--disk-cache-size={self.cache_mb * 1024 * 1024}',
+            # A browser that was killed would otherwise offer to restore its tabs
+            '--hide-crash-restore-bubble',
+        ]
+
+    def release(self, path):
+        """The browser using `path` has quit: count the session and compact the profile when due"""
+        with self._lock:
+            sessions = self._sessions.get(path, 0) + 1
+        try:
+            if sessions >= self.compact_every or dir_size_mb(path) > self.max_mb:
+                self.compact(path)
+                sessions = 0
+        except Exception as e:
+            logger.warning(f"Could not compact Chrome profile {path}: {e}")
+        finally:
+            with self._lock:
+                self._sessions[path] = sessions
+                self._in_use.discard(path)
+                self._drop_lock(path)
+
+    def compact(self, path):
+        """Shrink a profile that no browser is using. Returns its size in MB afterwards."""
+        before = dir_size_mb(path)
+        for name in REGENERABLE_DIRS:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        size = dir_size_mb(path)
+        if size > self.max_mb:
+            shutil.rmtree(os.path.join(path, HTTP_CACHE_DIR), ignore_errors=True)
+            size = dir_size_mb(path)
+        if size > self.max_mb:
+            # Cookies and storage alone are over the cap: start this identity afresh
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+            size = 0.0
+            with self._lock:
+                self.resets += 1
+            logger.info(f"Reset Chrome profile {os.path.basename(path)} ({before:.0f} MB, cap {self.max_mb} MB)")
+        else:
+            logger.info(f"Compacted Chrome profile {os.path.basename(path)}: {before:.0f} MB -> {size:.0f} MB")
+        with self._lock:
+            self.compactions += 1
+        return size
+
+    def prune(self, keep):
+        """
+        Delete the profiles of proxies not in `keep` (proxy URLs). The direct profile,
+        profiles in use and profiles used within `grace` seconds stay.
+        Returns the number of profiles removed.
+        """
+        identities = {self.identity(proxy) for proxy in keep if proxy}
+        identities.add('direct')
+
+        removed = 0
+        now = time.time()
+        with self._lock:
+            try:
+                names = os.listdir(self.root)
+            except FileNotFoundError:
+                return 0
+            for name in names:
+                path = os.path.join(self.root, name)
+                if name.endswith('.lock') or name.rpartition('-')[0] in identities or path in self._in_use:
+                    continue
+                try:
+                    if now - os.path.getmtime(path) < self.grace or self._locked_elsewhere(path):
+                        continue
+                    if not self._take_lock(path):
+                        continue  # leased by another processor
+                    try:
+                        shutil.rmtree(path)
+                    finally:
+                        self._drop_lock(path)
+                    self._sessions.pop(path, None)
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove Chrome profile {path}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} unused Chrome profile(s)")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            try:
+                profiles = sum(1 for name in os.listdir(self.root) if not name.endswith('.lock'))
+            except FileNotFoundError:
+                profiles = 0
+            return {
+                'profiles': profiles,
+                'in_use': len(self._in_use),
+                'compactions': self.compactions,
+                'resets': self.resets,
+            }
+
+
+# Shared by every scraper and browser pool in the process
+profile_pool = ChromeProfilePool()
@@ -1,14 +1,40 @@
 import sqlite3
+import struct
+import hashlib
+import threading
 from datetime import datetime
 from contextlib import contextmanager
 
 import os
 
+# Sortable columns for the paginated keyword list. NULLs are mapped to sentinels
+# so keyset pagination can compare (value, id) pairs directly.
+KEYWORD_SORT_COLUMNS = {
+    'id': 'k.id',
+    'keyword': 'k.keyword',
+    'client_name': "COALESCE(k.client_name, '')",
+    'country': "COALESCE(k.country, '')",
+    'created_at': 'k.created_at',
+    'position': 'COALESCE(h.position, 1000000)',
+    'checked_at': "COALESCE(h.checked_at, '')",
+}
+
 class Database:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, reuse_connections=True):
         # Use environment variable or default
         self.db_path = db_path or os.getenv('DATABASE_PATH', 'rankings.db')
         
+        # Keep one tuned connection per thread instead of reconnecting on every call
+        self.reuse_connections = reuse_connections
+        self.cache_size_kb = int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        
+        # Bumped on every write that changes the keyword list; drives /api/keywords ETags
+        self.data_version = 0
+        self._version_lock = threading.Lock()
+        
         # Ensure directory exists for database
         db_dir = os.path.dirname(self.db_path)
         if db_dir and not os.path.exists(db_dir):
@@ -16,15 +42,60 @@ class Database:
         
         self.init_db()
     
+    def _connect(self):
+        # The statement cache is per connection, so reused connections keep their prepared statements
+        conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=256, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.reuse_connections:
+            # WAL lets dashboard reads run while scrapers write; NORMAL sync is safe under WAL
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+    
     @contextmanager
     def get_conn(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        if not self.reuse_connections:
+            conn = self._connect()
+            try:
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
+            return
+        
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        
+        # Only the outermost block commits, so nested calls share one transaction
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
         try:
             yield conn
-            conn.commit()
+            if depth == 0:
+                conn.commit()
+        except BaseException:
+            if depth == 0:
+                conn.rollback()
+            raise
         finally:
-            conn.close()
+            self._local.depth = depth
+    
+    def close(self):
+        """Close every pooled connection (e.g. on shutdown)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
     
     def init_db(self):
         with self.get_conn() as conn:
@@ -58,9 +129,106 @@ class Database:
                     keyword_id INTEGER NOT NULL,
                     position INTEGER,
                     checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    matched_url TEXT,
+                    page INTEGER,
+                    pages_checked INTEGER,
+                    duration_ms INTEGER,
+                    strategy TEXT,
+                    search_depth INTEGER,
+                    snapshot_id INTEGER,
+                    FOREIGN KEY (keyword_id) REFERENCES keywords(id) ON DELETE CASCADE
+                )
+            ''')
+
+            # Add scrape detail columns if they don't exist (for backward compatibility)
+            self._add_missing_columns(cursor, 'position_history', [
+                ('matched_url', 'TEXT'),
+                ('page', 'INTEGER'),
+                ('pages_checked', 'INTEGER'),
+                ('duration_ms', 'INTEGER'),
+                ('strategy', 'TEXT'),
+                ('search_depth', 'INTEGER'),
+                ('snapshot_id', 'INTEGER'),
+            ])
+
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_position_history_keyword_checked ON position_history (keyword_id, checked_at)'
+            )
+
+            # Full result lists of each scrape. URLs are stored once in serp_urls; a snapshot
+            # is the ordered list of their ids packed as little-endian uint32s, shared by every
+            # check that saw the same list (digest). search_depth is how far down it is complete.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS serp_urls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL UNIQUE
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS serp_snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    digest TEXT NOT NULL UNIQUE,
+                    url_ids BLOB NOT NULL,
+                    search_depth INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Latest check per keyword, kept current by a trigger so the keyword list
+            # never has to rank the whole history table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS latest_position (
+                    keyword_id INTEGER PRIMARY KEY,
+                    history_id INTEGER NOT NULL,
+                    position INTEGER,
+                    checked_at TIMESTAMP,
                     FOREIGN KEY (keyword_id) REFERENCES keywords(id) ON DELETE CASCADE
                 )
             ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_position_history_latest
+                AFTER INSERT ON position_history
+                BEGIN
+                    INSERT INTO latest_position (keyword_id, history_id, position, checked_at)
+                    VALUES (NEW.keyword_id, NEW.id, NEW.position, NEW.checked_at)
+                    ON CONFLICT(keyword_id) DO UPDATE SET
+                        history_id = excluded.history_id,
+                        position = excluded.position,
+                        checked_at = excluded.checked_at
+                    WHERE excluded.checked_at >= latest_position.checked_at;
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_keywords_delete_latest
+                AFTER DELETE ON keywords
+                BEGIN
+                    DELETE FROM latest_position WHERE keyword_id = OLD.id;
+                END
+            ''')
+
+            # Backfill once for databases created before latest_position existed
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM latest_position) AS filled")
+            if not cursor.fetchone()['filled']:
+                cursor.execute('''
+                    INSERT INTO latest_position (keyword_id, history_id, position, checked_at)
+                    SELECT keyword_id, id, position, checked_at FROM (
+                        SELECT id, keyword_id, position, checked_at,
+                               ROW_NUMBER() OVER (PARTITION BY keyword_id ORDER BY checked_at DESC, id DESC) as rn
+                        FROM position_history
+                    ) WHERE rn = 1 AND keyword_id IN (SELECT id FROM keywords)
+                ''')
+            
+            # Proxy pool handed out to local scrapers (keywords may still pin their own proxy)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS proxies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL UNIQUE,
+                    label TEXT,
+                    max_concurrency INTEGER NOT NULL DEFAULT 1,
+                    enabled INTEGER NOT NULL DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
             
             # Processing queue table
             cursor.execute('''
@@ -68,12 +236,45 @@ class Database:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     keyword_id INTEGER NOT NULL,
                     queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    claimed_by TEXT,
+                    claimed_at TIMESTAMP,
+                    lease_expires_at TIMESTAMP,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    finished_at TIMESTAMP,
+                    last_error TEXT,
                     FOREIGN KEY (keyword_id) REFERENCES keywords(id) ON DELETE CASCADE
                 )
             ''')
+
+            # Add queue state columns if they don't exist (for backward compatibility)
+            self._add_missing_columns(cursor, 'processing_queue', [
+                ('status', "TEXT NOT NULL DEFAULT 'pending'"),
+                ('claimed_by', 'TEXT'),
+                ('claimed_at', 'TIMESTAMP'),
+                ('lease_expires_at', 'TIMESTAMP'),
+                ('attempts', 'INTEGER NOT NULL DEFAULT 0'),
+                ('finished_at', 'TIMESTAMP'),
+                ('last_error', 'TEXT'),
+            ])
+
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_processing_queue_status ON processing_queue (status, lease_expires_at)'
+            )
             
             conn.commit()
     
+    def _bump_version(self):
+        with self._version_lock:
+            self.data_version += 1
+    
+    def _add_missing_columns(self, cursor, table, columns):
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row['name'] for row in cursor.fetchall()}
+        for column, definition in columns:
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
     def add_keyword(self, keyword, url, country=None, proxy=None, client_name=None):
         with self.get_conn() as conn:
             cursor = conn.cursor()
@@ -82,9 +283,12 @@ class Database:
                     'INSERT INTO keywords (keyword, url, country, proxy, client_name) VALUES (?, ?, ?, ?, ?)',
                     (keyword, url, country, proxy, client_name)
                 )
-                return cursor.lastrowid
+                keyword_id = cursor.lastrowid
             except sqlite3.IntegrityError:
                 return None  # Already exists
+        # Bump only after commit so an ETag never describes uncommitted data
+        self._bump_version()
+        return keyword_id
     
     def get_all_keywords(self, client_name=None):
         with self.get_conn() as conn:
@@ -94,11 +298,7 @@ class Database:
                 SELECT k.id, k.keyword, k.url, k.country, k.proxy, k.client_name, k.created_at,
                        h.position, h.checked_at
                 FROM keywords k
-                LEFT JOIN (
-                    SELECT keyword_id, position, checked_at,
-                           ROW_NUMBER() OVER (PARTITION BY keyword_id ORDER BY checked_at DESC) as rn
-                    FROM position_history
-                ) h ON k.id = h.keyword_id AND h.rn = 1
+                LEFT JOIN latest_position h ON h.keyword_id = k.id
             '''
             params = []
             if client_name:
@@ -110,27 +310,270 @@ class Database:
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
     
-    def add_position_check(self, keyword_id, position):
+    @staticmethod
+    def _keyword_filters(client_name=None, country=None, min_position=None, max_position=None, search=None):
+        """WHERE conditions and parameters shared by the keyword list and its count"""
+        conditions = []
+        params = []
+        if client_name:
+            conditions.append("k.client_name = ?")
+            params.append(client_name)
+        if country:
+            conditions.append("k.country = ?")
+            params.append(country)
+        if min_position is not None:
+            conditions.append("h.position >= ?")
+            params.append(min_position)
+        if max_position is not None:
+            conditions.append("h.position <= ?")
+            params.append(max_position)
+        if search:
+            # Substring match, case-insensitive (LIKE is for ASCII); % and _ in the term are literal
+            escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("k.keyword LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        return conditions, params
+    
+    def get_keywords_page(self, client_name=None, country=None, min_position=None, max_position=None,
+                          sort='id', order='desc', limit=None, after=None, search=None):
+        """
+        One page of the keyword list, filtered and sorted in SQL.
+
+        `limit=None` returns every matching row. `after` is the (sort_value, id)
+        pair of the last row of the previous page. `search` keeps keywords
+        containing the term.
+        Returns (rows, next_after) where next_after is None on the last page.
+        """
+        sort_expr = KEYWORD_SORT_COLUMNS[sort]
+        descending = order == 'desc'
+        
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            
+            query = f'''
+                SELECT k.id, k.keyword, k.url, k.country, k.proxy, k.client_name, k.created_at,
+                       h.position, h.checked_at, {sort_expr} AS sort_value
+                FROM keywords k
+                LEFT JOIN latest_position h ON h.keyword_id = k.id
+            '''
+            conditions, params = self._keyword_filters(client_name, country, min_position, max_position, search)
+            if after is not None:
+                conditions.append(f"({sort_expr}, k.id) {'<' if descending else '>'} (?, ?)")
+                params.extend(after)
+            
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            
+            direction = 'DESC' if descending else 'ASC'
+            query += f" ORDER BY {sort_expr} {direction}, k.id {direction} LIMIT ?"
+            params.append(limit + 1 if limit else -1)  # LIMIT -1 means no limit
+            
+            cursor.execute(query, params)
+            rows = [dict(row) for row in cursor.fetchall()]
+        
+        next_after = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_after = (rows[-1]['sort_value'], rows[-1]['id'])
+        for row in rows:
+            del row['sort_value']
+        return rows, next_after
+    
+    def count_keywords(self, client_name=None, country=None, min_position=None, max_position=None, search=None):
+        """How many keywords match the same filters as get_keywords_page, across all pages"""
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            query = '''
+                SELECT COUNT(*)
+                FROM keywords k
+                LEFT JOIN latest_position h ON h.keyword_id = k.id
+            '''
+            conditions, params = self._keyword_filters(client_name, country, min_position, max_position, search)
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            cursor.execute(query, params)
+            return cursor.fetchone()[0]
+    
+    def add_position_check(self, keyword_id, position, matched_url=None, page=None, pages_checked=None,
+                           duration_ms=None, strategy=None, search_depth=None, serp_urls=None, serp_depth=None):
         with self.get_conn() as conn:
             cursor = conn.cursor()
+            snapshot_id = self._store_snapshot(cursor, serp_urls, serp_depth)
             cursor.execute(
-                'INSERT INTO position_history (keyword_id, position) VALUES (?, ?)',
-                (keyword_id, position)
+                '''
+                INSERT INTO position_history (keyword_id, position, matched_url, page, pages_checked, duration_ms, strategy, search_depth, snapshot_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (keyword_id, position, matched_url, page, pages_checked, duration_ms, strategy, search_depth, snapshot_id)
+            )
+        self._bump_version()
+
+    def _store_snapshot(self, cursor, urls, search_depth=None, known=None):
+        """
+        Store a scrape's ordered result URLs and return the snapshot id (None without URLs).
+        `known` maps digest -> id to skip lookups for lists already stored in this transaction.
+        """
+        if not urls:
+            return None
+
+        cursor.executemany('INSERT OR IGNORE INTO serp_urls (url) VALUES (?)', [(url,) for url in set(urls)])
+        ids = self._url_ids(cursor, urls)
+        url_ids = struct.pack(f'<{len(urls)}I', *(ids[url] for url in urls))
+        digest = hashlib.sha1(f'{search_depth}:'.encode() + url_ids).hexdigest()
+
+        if known is not None and digest in known:
+            return known[digest]
+        cursor.execute(
+            'INSERT OR IGNORE INTO serp_snapshots (digest, url_ids, search_depth) VALUES (?, ?, ?)',
+            (digest, url_ids, search_depth)
+        )
+        cursor.execute('SELECT id FROM serp_snapshots WHERE digest = ?', (digest,))
+        snapshot_id = cursor.fetchone()['id']
+        if known is not None:
+            known[digest] = snapshot_id
+        return snapshot_id
+
+    def _url_ids(self, cursor, urls, chunk=500):
+        """{url: id} for URLs already in serp_urls"""
+        urls = list(set(urls))
+        ids = {}
+        for start in range(0, len(urls), chunk):
+            part = urls[start:start + chunk]
+            cursor.execute(f"SELECT id, url FROM serp_urls WHERE url IN ({','.join('?' * len(part))})", part)
+            ids.update((row['url'], row['id']) for row in cursor.fetchall())
+        return ids
+
+    def _urls_by_id(self, cursor, ids, chunk=500):
+        """{id: url} for serp_urls ids"""
+        ids = list(set(ids))
+        urls = {}
+        for start in range(0, len(ids), chunk):
+            part = ids[start:start + chunk]
+            cursor.execute(f"SELECT id, url FROM serp_urls WHERE id IN ({','.join('?' * len(part))})", part)
+            urls.update((row['id'], row['url']) for row in cursor.fetchall())
+        return urls
+
+    def add_position_checks(self, results):
+        """
+        Insert many scrape results in a single transaction.
+
+        Each result is a dict with keyword_id, position and optionally
+        matched_url, page, pages_checked, duration_ms, strategy, search_depth,
+        serp_urls, serp_depth and job_id. Results carrying a job_id also acknowledge that job;
+        results for jobs that are no longer claimed (already acknowledged
+        elsewhere) are skipped.
+        Returns {"inserted": count, "ignored_jobs": [job_id, ...]}.
+        """
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            rows = []
+            ignored_jobs = []
+            # Keywords sharing one search upload the same result list
+            snapshots = {}
+            for result in results:
+                job_id = result.get('job_id')
+                if job_id:
+                    cursor.execute(
+                        '''
+                        UPDATE processing_queue SET status = 'done', finished_at = CURRENT_TIMESTAMP, lease_expires_at = NULL
+                        WHERE id = ? AND status = 'claimed'
+                        ''',
+                        (job_id,)
+                    )
+                    if cursor.rowcount == 0:
+                        ignored_jobs.append(job_id)
+                        continue
+                rows.append((
+                    result['keyword_id'], result.get('position'), result.get('matched_url'),
+                    result.get('page'), result.get('pages_checked'), result.get('duration_ms'),
+                    result.get('strategy'), result.get('search_depth'),
+                    self._store_snapshot(cursor, result.get('serp_urls'), result.get('serp_depth'), snapshots)
+                ))
+
+            cursor.executemany(
+                '''
+                INSERT INTO position_history (keyword_id, position, matched_url, page, pages_checked, duration_ms, strategy, search_depth, snapshot_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                rows
             )
+        if rows:
+            self._bump_version()
+        return {"inserted": len(rows), "ignored_jobs": ignored_jobs}
     
     def get_position_history(self, keyword_id, limit=10):
         with self.get_conn() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                'SELECT position, checked_at FROM position_history WHERE keyword_id = ? ORDER BY checked_at DESC LIMIT ?',
+                'SELECT position, checked_at, matched_url, page, pages_checked, duration_ms, strategy, search_depth FROM position_history WHERE keyword_id = ? ORDER BY checked_at DESC LIMIT ?',
                 (keyword_id, limit)
             )
             return [dict(row) for row in cursor.fetchall()]
     
+    def get_serp_snapshots(self, keyword_id, limit=20):
+        """
+        Stored result lists for the keyword's search, newest first. Every tracked URL with
+        the same keyword and country shares the search, so their checks are included.
+        Returns {url, snapshots: [{checked_at, search_depth, urls}]} with the keyword's
+        tracked URL, or None for an unknown keyword.
+        """
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT keyword, country, url FROM keywords WHERE id = ?', (keyword_id,))
+            keyword = cursor.fetchone()
+            if keyword is None:
+                return None
+            cursor.execute(
+                '''
+                SELECT DISTINCT h.checked_at, s.id, s.search_depth, s.url_ids
+                FROM keywords k
+                JOIN position_history h ON h.keyword_id = k.id
+                JOIN serp_snapshots s ON s.id = h.snapshot_id
+                WHERE lower(k.keyword) = lower(?) AND lower(COALESCE(k.country, '')) = lower(COALESCE(?, ''))
+                ORDER BY h.checked_at DESC, s.id DESC
+                LIMIT ?
+                ''',
+                (keyword['keyword'], keyword['country'], limit)
+            )
+            rows = cursor.fetchall()
+            url_ids = {row['id']: struct.unpack(f"<{len(row['url_ids']) // 4}I", row['url_ids']) for row in rows}
+            urls = self._urls_by_id(cursor, [url_id for ids in url_ids.values() for url_id in ids])
+            return {'url': keyword['url'], 'snapshots': [
+                {
+                    'checked_at': row['checked_at'],
+                    'search_depth': row['search_depth'],
+                    'urls': [urls[url_id] for url_id in url_ids[row['id']]],
+                }
+                for row in rows
+            ]}
+    
+    def get_recent_checks(self, keyword_ids, limit=20):
+        """Latest `limit` checks for each keyword, newest first: {keyword_id: [check, ...]}"""
+        if not keyword_ids:
+            return {}
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join('?' * len(keyword_ids))
+            cursor.execute(
+                f'''
+                SELECT keyword_id, position, checked_at, pages_checked, search_depth FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY keyword_id ORDER BY checked_at DESC, id DESC) AS n
+                    FROM position_history WHERE keyword_id IN ({placeholders})
+                ) WHERE n <= ?
+                ORDER BY keyword_id, n
+                ''',
+                (*keyword_ids, limit)
+            )
+            checks = {keyword_id: [] for keyword_id in keyword_ids}
+            for row in cursor.fetchall():
+                checks[row['keyword_id']].append(dict(row))
+            return checks
+    
     def delete_keyword(self, keyword_id):
         with self.get_conn() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM keywords WHERE id = ?', (keyword_id,))
+        self._bump_version()
 
     def update_keyword(self, keyword_id, keyword, url, country=None, proxy=None, client_name=None):
         with self.get_conn() as conn:
@@ -139,10 +582,245 @@ class Database:
                 'UPDATE keywords SET keyword = ?, url = ?, country = ?, proxy = ?, client_name = ? WHERE id = ?',
                 (keyword, url, country, proxy, client_name, keyword_id)
             )
-            return cursor.rowcount > 0 # Returns True if a row was updated
+            updated = cursor.rowcount > 0 # Returns True if a row was updated
+        if updated:
+            self._bump_version()
+        return updated
 
     def get_all_client_names(self):
         with self.get_conn() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT DISTINCT client_name FROM keywords WHERE client_name IS NOT NULL ORDER BY client_name')
             return [row['client_name'] for row in cursor.fetchall()]
+
+    # --- Proxy pool ---
+
+    def add_proxy(self, url, label=None, max_concurrency=1, enabled=True):
+        """Returns the new proxy's id, or None if the URL is already in the pool"""
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    'INSERT INTO proxies (url, label, max_concurrency, enabled) VALUES (?, ?, ?, ?)',
+                    (url, label, max_concurrency, int(enabled))
+                )
+            except sqlite3.IntegrityError:
+                return None
+            return cursor.lastrowid
+
+    def get_proxies(self, enabled_only=False):
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            query = 'SELECT id, url, label, max_concurrency, enabled, created_at FROM proxies'
+            if enabled_only:
+                query += ' WHERE enabled = 1'
+            cursor.execute(query + ' ORDER BY id')
+            return [dict(row, enabled=bool(row['enabled'])) for row in cursor.fetchall()]
+
+    def update_proxy(self, proxy_id, **fields):
+        """Change label, max_concurrency and/or enabled; returns False for an unknown proxy"""
+        updates = {key: value for key, value in fields.items()
+                   if key in ('label', 'max_concurrency', 'enabled') and value is not None}
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            if not updates:
+                cursor.execute('SELECT 1 FROM proxies WHERE id = ?', (proxy_id,))
+                return cursor.fetchone() is not None
+            assignments = ', '.join(f'{key} = ?' for key in updates)
+            cursor.execute(f'UPDATE proxies SET {assignments} WHERE id = ?', (*updates.values(), proxy_id))
+            return cursor.rowcount > 0
+
+    def delete_proxy(self, proxy_id):
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM proxies WHERE id = ?', (proxy_id,))
+            return cursor.rowcount > 0
+
+    # --- Processing queue ---
+
+    def enqueue_keywords(self, keyword_ids):
+        """Queue keywords for scraping, skipping ones already pending or claimed. Returns how many were added."""
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            queued = 0
+            for keyword_id in keyword_ids:
+                cursor.execute(
+                    '''
+                    INSERT INTO processing_queue (keyword_id)
+                    SELECT ? WHERE NOT EXISTS (
+                        SELECT 1 FROM processing_queue
+                        WHERE keyword_id = ? AND status IN ('pending', 'claimed')
+                    )
+                    ''',
+                    (keyword_id, keyword_id)
+                )
+                queued += cursor.rowcount
+            return queued
+
+    def claim_jobs(self, worker_id, limit=50, visibility_timeout=900, max_attempts=3):
+        """
+        Atomically claim up to `limit` jobs for worker_id.
+
+        Pending jobs and claimed jobs whose visibility timeout has expired are
+        both eligible, so work from a crashed processor is retried. Jobs that
+        already used up max_attempts are marked failed instead. Pending jobs
+        for the same keyword and country as a claimed job are claimed with it,
+        even past `limit`, so their shared SERP is only fetched once.
+        Returns keyword rows with job_id and attempts added.
+        """
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            # Take the write lock up front so two processors cannot claim the same rows
+            cursor.execute('BEGIN IMMEDIATE')
+
+            cursor.execute(
+                '''
+                UPDATE processing_queue
+                SET status = 'failed', finished_at = CURRENT_TIMESTAMP,
+                    last_error = COALESCE(last_error, 'Visibility timeout expired')
+                WHERE status = 'claimed' AND lease_expires_at <= CURRENT_TIMESTAMP AND attempts >= ?
+                ''',
+                (max_attempts,)
+            )
+
+            cursor.execute(
+                '''
+                SELECT id FROM processing_queue
+                WHERE status = 'pending'
+                   OR (status = 'claimed' AND lease_expires_at <= CURRENT_TIMESTAMP)
+                ORDER BY id
+                LIMIT ?
+                ''',
+                (limit,)
+            )
+            job_ids = [row['id'] for row in cursor.fetchall()]
+            if not job_ids:
+                return []
+
+            # Bring along queued jobs for the same search so one processor fetches each SERP once
+            placeholders = ','.join('?' * len(job_ids))
+            cursor.execute(
+                f'''
+                SELECT q.id FROM processing_queue q
+                JOIN keywords k ON k.id = q.keyword_id
+                WHERE q.status = 'pending' AND q.id NOT IN ({placeholders})
+                  AND (lower(k.keyword), lower(COALESCE(k.country, ''))) IN (
+                      SELECT lower(k2.keyword), lower(COALESCE(k2.country, ''))
+                      FROM processing_queue q2
+                      JOIN keywords k2 ON k2.id = q2.keyword_id
+                      WHERE q2.id IN ({placeholders})
+                  )
+                ''',
+                job_ids + job_ids
+            )
+            job_ids += [row['id'] for row in cursor.fetchall()]
+
+            placeholders = ','.join('?' * len(job_ids))
+            cursor.execute(
+                f'''
+                UPDATE processing_queue
+                SET status = 'claimed', claimed_by = ?, claimed_at = CURRENT_TIMESTAMP,
+                    lease_expires_at = datetime('now', ?), attempts = attempts + 1
+                WHERE id IN ({placeholders})
+                ''',
+                [worker_id, f'+{int(visibility_timeout)} seconds'] + job_ids
+            )
+
+            cursor.execute(
+                f'''
+                SELECT q.id AS job_id, q.attempts, q.lease_expires_at,
+                       k.id, k.keyword, k.url, k.country, k.proxy, k.client_name, k.created_at
+                FROM processing_queue q
+                JOIN keywords k ON k.id = q.keyword_id
+                WHERE q.id IN ({placeholders})
+                ORDER BY q.id
+                ''',
+                job_ids
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def ack_job(self, job_id, position, matched_url=None, page=None, pages_checked=None, duration_ms=None,
+                strategy=None, search_depth=None, serp_urls=None, serp_depth=None):
+        """
+        Record the result of a claimed job and mark it done in one transaction.
+        Returns False if the job is unknown or was already finished by another claim.
+        """
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                UPDATE processing_queue SET status = 'done', finished_at = CURRENT_TIMESTAMP, lease_expires_at = NULL
+                WHERE id = ? AND status = 'claimed'
+                ''',
+                (job_id,)
+            )
+            if cursor.rowcount == 0:
+                return False
+
+            snapshot_id = self._store_snapshot(cursor, serp_urls, serp_depth)
+            cursor.execute(
+                '''
+                INSERT INTO position_history (keyword_id, position, matched_url, page, pages_checked, duration_ms, strategy, search_depth, snapshot_id)
+                SELECT keyword_id, ?, ?, ?, ?, ?, ?, ?, ? FROM processing_queue WHERE id = ?
+                ''',
+                (position, matched_url, page, pages_checked, duration_ms, strategy, search_depth, snapshot_id, job_id)
+            )
+        self._bump_version()
+        return True
+
+    def fail_job(self, job_id, error=None, max_attempts=3, retry=False):
+        """
+        Release a claimed job after an error: back to pending, or failed once it has used up its attempts.
+        With `retry` the job was never tried (e.g. its proxy was resting), so the attempt is given back.
+        """
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            if retry:
+                cursor.execute(
+                    '''
+                    UPDATE processing_queue
+                    SET status = 'pending', attempts = MAX(attempts - 1, 0),
+                        claimed_by = NULL, lease_expires_at = NULL, last_error = ?
+                    WHERE id = ? AND status = 'claimed'
+                    ''',
+                    (error, job_id)
+                )
+                return cursor.rowcount > 0
+            cursor.execute(
+                '''
+                UPDATE processing_queue
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    finished_at = CASE WHEN attempts >= ? THEN CURRENT_TIMESTAMP ELSE NULL END,
+                    claimed_by = NULL, lease_expires_at = NULL, last_error = ?
+                WHERE id = ? AND status = 'claimed'
+                ''',
+                (max_attempts, max_attempts, error, job_id)
+            )
+            return cursor.rowcount > 0
+
+    def get_queue_stats(self):
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT
+                    SUM(status = 'pending') AS pending,
+                    SUM(status = 'claimed' AND lease_expires_at > CURRENT_TIMESTAMP) AS claimed,
+                    SUM(status = 'claimed' AND lease_expires_at <= CURRENT_TIMESTAMP) AS stale,
+                    SUM(status = 'done') AS done,
+                    SUM(status = 'failed') AS failed
+                FROM processing_queue
+                '''
+            )
+            row = cursor.fetchone()
+            return {key: row[key] or 0 for key in row.keys()}
+
+    def purge_finished_jobs(self, days=7):
+        """Delete done/failed queue rows older than `days` so the queue table stays small"""
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM processing_queue WHERE status IN ('done', 'failed') AND finished_at < datetime('now', ?)",
+                (f'-{int(days)} days',)
+            )
+            return cursor.rowcount
@@ -0,0 +1,68 @@
+import os
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_PAGE_SIZE = 10
+
+
+class DepthPlanner:
+    """
+    Picks how deep each claimed job searches, from the keyword's recent checks.
+
+    - Keywords without enough history, and movers, get the full depth.
+    - Stable top-10 keywords keep the full depth but ask for page 1 first
+      (initial_results), so the usual case is one light page load and a drop
+      still gets searched all the way down.
+    - Keywords absent from every recent check get a shallow search, plus a
+      full-depth one whenever the last full-depth miss is older than
+      `full_recheck_days`.
+    """
+
+    def __init__(self, full_results=None, history_checks=None, absent_results=None, full_recheck_days=None):
+        self.full_results = full_results or int(os.getenv('DEPTH_FULL_RESULTS', '100'))
+        self.history_checks = history_checks or int(os.getenv('DEPTH_HISTORY_CHECKS', '3'))
+        self.absent_results = absent_results or int(os.getenv('DEPTH_ABSENT_RESULTS', '30'))
+        self.full_recheck_days = full_recheck_days or float(os.getenv('DEPTH_FULL_RECHECK_DAYS', '7'))
+
+    def _pages(self, results):
+        return max(1, -(-results // GOOGLE_PAGE_SIZE))
+
+    def _plan(self, max_results, reason, initial_results=None):
+        return {
+            'max_results': max_results,
+            'max_pages': self._pages(max_results),
+            'initial_results': initial_results,
+            'depth_reason': reason,
+        }
+
+    def _is_full_depth(self, check):
+        """A miss only proves absence down to the depth that was actually searched"""
+        return (check.get('search_depth') or 0) >= self.full_results
+
+    def plan(self, history, now=None):
+        """
+        history: the keyword's checks, newest first, as dicts with position,
+        checked_at and search_depth. Returns {max_results, max_pages,
+        initial_results, depth_reason}.
+        """
+        recent = history[:self.history_checks]
+        if len(recent) < self.history_checks:
+            return self._plan(self.full_results, 'new')
+
+        positions = [check['position'] for check in recent]
+
+        if all(position and position <= GOOGLE_PAGE_SIZE for position in positions):
+            return self._plan(self.full_results, 'stable-top10', initial_results=GOOGLE_PAGE_SIZE)
+
+        if all(position is None for position in positions):
+            now = now or datetime.utcnow()
+            last_full_miss = next((check for check in history if self._is_full_depth(check)), None)
+            if last_full_miss and last_full_miss['position'] is None:
+                checked_at = datetime.strptime(last_full_miss['checked_at'], '%Y-%m-%d %H:%M:%S')
+                if now - checked_at < timedelta(days=self.full_recheck_days):
+                    return self._plan(min(self.absent_results, self.full_results), 'absent-shallow')
+            return self._plan(self.full_results, 'absent-full')
+
+        return self._plan(self.full_results, 'full')
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class JobWaiters:
+    """
+    FIFO line of long-polling job claims.
+
+    A claim that finds the queue empty parks here until notify() reports new
+    jobs. Waiters are woken oldest first, only as many as the new jobs can
+    satisfy, so the processor that has been idle longest gets work first and
+    the rest stay parked instead of stampeding the database. Must be used from
+    the event loop thread.
+    """
+
+    def __init__(self):
+        self._waiters = deque()  # (future, limit)
+
+    def __len__(self):
+        return len(self._waiters)
+
+    def park(self, limit, front=False):
+        """Join the line (or rejoin at the front after losing a race) and return a future to await"""
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, limit)
+        if front:
+            self._waiters.appendleft(entry)
+        else:
+            self._waiters.append(entry)
+        return future
+
+    def leave(self, future):
+        """Drop a waiter that timed out or was cancelled"""
+        for entry in self._waiters:
+            if entry[0] is future:
+                self._waiters.remove(entry)
+                break
+
+    def notify(self, count):
+        """Wake waiters in FIFO order until their claim limits cover `count` new jobs"""
+        while count > 0 and self._waiters:
+            future, limit = self._waiters.popleft()
+            if future.done():
+                continue
+            future.set_result(True)
+            count -= limit
@@ -0,0 +1,62 @@
+import json
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class EventBroker:
+    """
+    In-process fan-out of keyword progress events to connected dashboards.
+
+    publish() and subscribe() must be used from the event loop thread. Every
+    subscriber gets its own bounded queue; a client that stops reading is
+    dropped instead of holding up the others. The last `history` events are
+    kept so a reconnecting EventSource can resume from Last-Event-ID.
+    """
+
+    def __init__(self, max_queue=1000, history=500):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._history = deque(maxlen=history)
+        self._next_id = 1
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        event = {"id": self._next_id, "type": event_type, "data": data}
+        self._next_id += 1
+        self._history.append(event)
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning("Dropping slow event subscriber")
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                # None tells the stream to close; the browser reconnects with Last-Event-ID
+                queue.put_nowait(None)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber; returns its queue pre-filled with any missed events"""
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        if last_event_id is not None:
+            missed = [event for event in self._history if event["id"] > last_event_id]
+            for event in missed[-self.max_queue:]:
+                queue.put_nowait(event)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    @staticmethod
+    def format_sse(event):
+        """Serialize an event in text/event-stream framing"""
+        return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
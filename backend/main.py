@@ -2,6 +2,11 @@ import sys
 import asyncio
 import logging
 import os
+import json
+import uuid
+import base64
+import hashlib
+import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -23,14 +28,20 @@ if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     logger.info("Set WindowsSelectorEventLoopPolicy for main process")
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from typing import Optional, List
 
 from scraper import GoogleRankScraper
-from database import Database
+from database import Database, KEYWORD_SORT_COLUMNS
+from events import EventBroker
+from dispatch import JobWaiters
+from depth_planner import DepthPlanner
+from url_matcher import UrlMatcher
+from proxy_pool import parse_proxy
 
 # --- Authentication Configuration ---
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -64,9 +75,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 db = Database()
+events = EventBroker()
+
+# Server-sent events: heartbeat keeps proxies from closing idle streams
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', '3000'))
+# Browsers pass the event-stream token in the URL; keep it short-lived and good for nothing else
+STREAM_TOKEN_SECONDS = int(os.getenv('STREAM_TOKEN_SECONDS', '60'))
+STREAM_TOKEN_SCOPE = 'events'
+PROGRESS_EVENTS = ('started', 'page', 'finished')
+
+# Distinguishes ETags issued by this process from ones issued before a restart
+ETAG_EPOCH = uuid.uuid4().hex[:8]
 
 # Pydantic models
 class KeywordCreate(BaseModel):
@@ -87,9 +111,49 @@ class KeywordResponse(BaseModel):
     checked_at: Optional[str]
     created_at: str
 
+class ProxyCreate(BaseModel):
+    url: str
+    label: Optional[str] = None
+    max_concurrency: int = 1
+    enabled: bool = True
+
+class ProxyUpdate(BaseModel):
+    label: Optional[str] = None
+    max_concurrency: Optional[int] = None
+    enabled: Optional[bool] = None
+
 class CheckRequest(BaseModel):
     keyword_id: Optional[int] = None  # If None, check all
 
+class JobFailure(BaseModel):
+    error: Optional[str] = None
+    retry: bool = False  # the job was released untried: its attempt does not count
+
+class PositionResult(BaseModel):
+    keyword_id: int
+    position: Optional[int] = None
+    matched_url: Optional[str] = None
+    page: Optional[int] = None
+    pages_checked: Optional[int] = None
+    duration_ms: Optional[int] = None
+    strategy: Optional[str] = None
+    search_depth: Optional[int] = None
+    serp_urls: Optional[List[str]] = None  # every result URL of the search, in order
+    serp_depth: Optional[int] = None
+    job_id: Optional[int] = None
+
+class PositionBatch(BaseModel):
+    results: List[PositionResult]
+
+class ProgressEvent(BaseModel):
+    keyword_id: int
+    event: str  # started, page or finished
+    job_id: Optional[int] = None
+    page: Optional[int] = None
+    results: Optional[int] = None
+    position: Optional[int] = None
+    worker_id: Optional[str] = None
+
 # --- Authentication Models ---
 class Token(BaseModel):
     access_token: str
@@ -119,20 +183,37 @@ async def authenticate_user(username: str, password: str):
         return {"username": ADMIN_USERNAME}
     return None
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def decode_user(token: Optional[str], scope: Optional[str] = None):
+    """The user a token belongs to; scoped tokens (e.g. 'events') only pass where that scope is expected"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("scope") != scope:
             raise credentials_exception
         return {"username": username}
     except JWTError:
         raise credentials_exception
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return decode_user(token)
+
+async def get_stream_user(request: Request, token: Optional[str] = None):
+    """
+    Like get_current_user, but EventSource cannot send headers, so browsers pass
+    ?token= instead. Query strings end up in access logs, so that token is a
+    short-lived one from /api/events/token that only opens the event stream.
+    """
+    if token:
+        return decode_user(token, scope=STREAM_TOKEN_SCOPE)
+    authorization = request.headers.get('authorization', '')
+    return decode_user(authorization[7:] if authorization.lower().startswith('bearer ') else None)
 # --- End Authentication Functions ---
 
 @app.get("/")
@@ -145,6 +226,10 @@ async def startup_event():
     for route in app.routes:
         print(f"  {route.methods if hasattr(route, 'methods') else 'N/A'} {route.path}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    db.close()
+
 @app.post("/api/login", response_model=Token)
 async def login_for_access_token(form_data: LoginRequest):
     user = await authenticate_user(form_data.username, form_data.password)
@@ -161,10 +246,19 @@ async def login_for_access_token(form_data: LoginRequest):
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+def clean_proxy(value):
+    """Validate a proxy URL once, on the way in; returns its canonical form (None for no proxy)"""
+    if not value or not value.strip():
+        return None
+    try:
+        return parse_proxy(value).url
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid proxy: {e}")
+
 @app.post("/api/track")
 async def add_tracking(data: KeywordCreate, current_user: dict = Depends(get_current_user)):
     """Add new keyword to track"""
-    keyword_id = db.add_keyword(data.keyword, data.url, data.country, data.proxy, data.client_name)
+    keyword_id = db.add_keyword(data.keyword, data.url, data.country, clean_proxy(data.proxy), data.client_name)
     if keyword_id is None:
         raise HTTPException(status_code=400, detail="Keyword with this URL and country is already being tracked")
     
@@ -173,16 +267,63 @@ async def add_tracking(data: KeywordCreate, current_user: dict = Depends(get_cur
 @app.put("/api/keyword/{keyword_id}")
 async def update_keyword(keyword_id: int, data: KeywordCreate, current_user: dict = Depends(get_current_user)):
     """Update an existing keyword"""
-    updated = db.update_keyword(keyword_id, data.keyword, data.url, data.country, data.proxy, data.client_name)
+    updated = db.update_keyword(keyword_id, data.keyword, data.url, data.country, clean_proxy(data.proxy), data.client_name)
     if not updated:
         raise HTTPException(status_code=404, detail="Keyword not found")
     return {"message": "Keyword updated successfully"}
 
+def encode_cursor(after):
+    return base64.urlsafe_b64encode(json.dumps(after).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        value, keyword_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, int(keyword_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/keywords")
-async def get_keywords(client_name: Optional[str] = None, current_user: dict = Depends(get_current_user)):
-    """Get all tracked keywords with latest position, optionally filtered by client_name"""
-    keywords = db.get_all_keywords(client_name=client_name)
-    return {"keywords": keywords}
+async def get_keywords(request: Request, response: Response,
+                       client_name: Optional[str] = None, country: Optional[str] = None,
+                       min_position: Optional[int] = None, max_position: Optional[int] = None,
+                       search: Optional[str] = None, sort: str = 'id', order: str = 'desc',
+                       limit: Optional[int] = None, cursor: Optional[str] = None,
+                       current_user: dict = Depends(get_current_user)):
+    """
+    Get tracked keywords with latest position.
+
+    Filters by client, country, position range and keyword text (`search`) and
+    sorts server-side. Pass `limit` to page through results with the returned
+    `next_cursor`; without it every matching keyword is returned. `total` counts
+    the matches across all pages. Responses carry an ETag derived from the
+    data version, so an unchanged poll with If-None-Match gets a 304 without
+    touching the database.
+    """
+    if sort not in KEYWORD_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(KEYWORD_SORT_COLUMNS)}")
+    if order not in ('asc', 'desc'):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    
+    query_hash = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:12]
+    etag = f'W/"{ETAG_EPOCH}-{db.data_version}-{query_hash}"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    
+    after = decode_cursor(cursor) if cursor else None
+    filters = dict(client_name=client_name, country=country, min_position=min_position,
+                   max_position=max_position, search=(search or '').strip() or None)
+    keywords, next_after = db.get_keywords_page(
+        **filters,
+        sort=sort, order=order,
+        limit=max(1, min(limit, 1000)) if limit else None,
+        after=after
+    )
+    # Later pages are fetched with a cursor; the first one tells the client how many there are in all
+    total = db.count_keywords(**filters) if after is None else None
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return {"keywords": keywords, "next_cursor": encode_cursor(next_after) if next_after else None, "total": total}
 
 @app.get("/api/client-names")
 async def get_client_names(current_user: dict = Depends(get_current_user)):
@@ -190,24 +331,75 @@ async def get_client_names(current_user: dict = Depends(get_current_user)):
     client_names = db.get_all_client_names()
     return {"client_names": client_names}
 
-# Global variable to store keywords that need processing
-pending_keywords = []
+# Queue tuning for local processors
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', '900'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_LONG_POLL_MAX = int(os.getenv('JOB_LONG_POLL_MAX', '60'))
+# Parked claims re-check the queue this often, for expired leases and jobs queued by other server processes
+JOB_LONG_POLL_RECHECK = float(os.getenv('JOB_LONG_POLL_RECHECK', '5'))
+
+job_waiters = JobWaiters()
+depth_planner = DepthPlanner()
 
 @app.get("/api/check")
-async def get_pending_keywords(current_user: dict = Depends(get_current_user)):
-    """Get keywords that need to be processed by local scraper"""
-    global pending_keywords
-    if pending_keywords:
-        keywords = pending_keywords.copy()
-        pending_keywords.clear()  # Clear after returning
-        return {"keywords": keywords}
+async def get_pending_keywords(request: Request, limit: int = 50, worker_id: Optional[str] = None,
+                               visibility_timeout: Optional[int] = None, wait: int = 0,
+                               current_user: dict = Depends(get_current_user)):
+    """
+    Claim a batch of queued keywords for a local scraper.
+
+    With `wait` (seconds, capped at JOB_LONG_POLL_MAX) an empty queue holds the
+    request open until jobs are queued or the wait runs out, instead of
+    answering 404 straight away. Waiting workers are served first come, first
+    served. Each job carries max_results, max_pages, initial_results and
+    depth_reason from the depth planner.
+    """
+    worker = worker_id or current_user["username"]
+    limit = max(1, min(limit, 500))
+    
+    def claim():
+        return db.claim_jobs(
+            worker,
+            limit=limit,
+            visibility_timeout=visibility_timeout or JOB_VISIBILITY_TIMEOUT,
+            max_attempts=JOB_MAX_ATTEMPTS
+        )
+    
+    jobs = claim()
+    deadline = time.monotonic() + max(0, min(wait, JOB_LONG_POLL_MAX))
+    rejoin = False
+    while not jobs:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        future = job_waiters.park(limit, front=rejoin)
+        try:
+            await asyncio.wait_for(future, min(remaining, JOB_LONG_POLL_RECHECK))
+        except asyncio.TimeoutError:
+            job_waiters.leave(future)
+        if await request.is_disconnected():
+            # Don't claim jobs for a processor that has gone away; pass its wake-up on
+            job_waiters.leave(future)
+            if future.done() and not future.cancelled():
+                job_waiters.notify(limit)
+            break
+        jobs = claim()
+        # Keep our place in line if someone else got there first
+        rejoin = True
+    
+    if jobs:
+        # Tell the scraper how deep to search each keyword, based on its recent checks
+        history = db.get_recent_checks([job['id'] for job in jobs])
+        for job in jobs:
+            job.update(depth_planner.plan(history[job['id']]))
+        logger.info(f"Worker {worker} claimed {len(jobs)} job(s)")
+        return {"keywords": jobs}
     else:
         raise HTTPException(status_code=404, detail="No keywords pending")
 
 @app.post("/api/check")
 async def check_rankings(data: CheckRequest = CheckRequest(), current_user: dict = Depends(get_current_user)):
     """Queue keywords for local scraping (visible browser)"""
-    global pending_keywords
     logger.info(f"Received check request: {data}")
     
     if data.keyword_id:
@@ -219,37 +411,201 @@ async def check_rankings(data: CheckRequest = CheckRequest(), current_user: dict
         logger.warning("No keywords found to check")
         raise HTTPException(status_code=404, detail="No keywords found")
     
-    # Add keywords to pending list for local scraper to pick up
-    pending_keywords = keywords
+    # Add keywords to the durable queue for local scrapers to claim
+    queued = db.enqueue_keywords([kw['id'] for kw in keywords])
+    db.purge_finished_jobs()
+    if queued:
+        job_waiters.notify(queued)
+        events.publish('queued', {"keyword_ids": [kw['id'] for kw in keywords]})
     
-    logger.info(f"Queued {len(keywords)} keyword(s) for local processing...")
+    logger.info(f"Queued {queued} keyword(s) for local processing ({len(keywords) - queued} already queued)...")
     
     return {
         "message": "Keywords queued for local processing with visible browser",
         "status": "queued",
-        "total_keywords": len(keywords)
+        "total_keywords": len(keywords),
+        "newly_queued": queued
     }
 
 @app.post("/api/update-position")
 async def update_position(data: dict, current_user: dict = Depends(get_current_user)):
-    """Update position from local scraper"""
+    """Update position from local scraper, acknowledging its job if one was claimed"""
     keyword_id = data.get('keyword_id')
     position = data.get('position')
+    job_id = data.get('job_id')
+    details = {key: data.get(key) for key in ('matched_url', 'page', 'pages_checked', 'duration_ms', 'strategy', 'search_depth',
+                                              'serp_urls', 'serp_depth')}
     
     if not keyword_id:
         raise HTTPException(status_code=400, detail="keyword_id is required")
     
-    db.add_position_check(keyword_id, position)
+    if job_id:
+        if not db.ack_job(job_id, position, **details):
+            logger.warning(f"Ignoring result for job {job_id}: already finished or not claimed")
+            return {"status": "ignored", "keyword_id": keyword_id, "job_id": job_id}
+    else:
+        db.add_position_check(keyword_id, position, **details)
     logger.info(f"Updated position for keyword {keyword_id}: {position}")
+    publish_finished({"keyword_id": keyword_id, "position": position, **details})
     
     return {"status": "updated", "keyword_id": keyword_id, "position": position}
 
+@app.post("/api/update-positions")
+async def update_positions(data: PositionBatch, current_user: dict = Depends(get_current_user)):
+    """Store a batch of results from a local scraper in one transaction"""
+    if not data.results:
+        raise HTTPException(status_code=400, detail="results must not be empty")
+    
+    summary = db.add_position_checks([result.model_dump() for result in data.results])
+    logger.info(f"Stored {summary['inserted']} result(s) in bulk, ignored {len(summary['ignored_jobs'])} finished job(s)")
+    
+    ignored = set(summary['ignored_jobs'])
+    for result in data.results:
+        if not result.job_id or result.job_id not in ignored:
+            publish_finished(result.model_dump(exclude={'job_id'}))
+    
+    return {"status": "updated", **summary}
+
+def publish_finished(result):
+    """Tell dashboards a result was stored; checked_at matches SQLite's CURRENT_TIMESTAMP format"""
+    # The full result list is stored, not streamed
+    result = {key: value for key, value in result.items() if key not in ('serp_urls', 'serp_depth')}
+    events.publish('finished', {**result, "checked_at": datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), "stored": True})
+
+@app.post("/api/progress")
+async def report_progress(data: ProgressEvent, current_user: dict = Depends(get_current_user)):
+    """Relay a processor's progress on one keyword to connected dashboards"""
+    if data.event not in PROGRESS_EVENTS:
+        raise HTTPException(status_code=400, detail=f"event must be one of: {', '.join(PROGRESS_EVENTS)}")
+    events.publish(data.event, data.model_dump(exclude={'event'}, exclude_none=True))
+    return {"status": "ok", "subscribers": events.subscriber_count}
+
+@app.post("/api/events/token")
+async def create_stream_token(current_user: dict = Depends(get_current_user)):
+    """A token for ?token= on /api/events: valid for STREAM_TOKEN_SECONDS, and for nothing else"""
+    token = create_access_token(
+        data={"sub": current_user["username"], "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_SECONDS)
+    )
+    return {"token": token, "expires_in": STREAM_TOKEN_SECONDS}
+
+@app.get("/api/events")
+async def stream_events(request: Request, last_event_id: Optional[int] = None,
+                        current_user: dict = Depends(get_stream_user)):
+    """
+    Server-sent event stream of keyword progress: queued, started, page,
+    finished. Reconnecting clients resume after the Last-Event-ID header, or
+    ?last_event_id= when they open a new stream with a fresh token.
+    """
+    try:
+        last_event_id = int(request.headers.get('last-event-id', ''))
+    except ValueError:
+        pass
+    queue = events.subscribe(last_event_id)
+    
+    async def stream():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    break
+                yield EventBroker.format_sse(event)
+        finally:
+            events.unsubscribe(queue)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/jobs/{job_id}/fail")
+async def fail_job(job_id: int, data: JobFailure = JobFailure(), current_user: dict = Depends(get_current_user)):
+    """Release a claimed job after a scraping error so it can be retried"""
+    if not db.fail_job(job_id, data.error, max_attempts=JOB_MAX_ATTEMPTS, retry=data.retry):
+        raise HTTPException(status_code=404, detail="Job not found or not claimed")
+    job_waiters.notify(1)
+    logger.info(f"Job {job_id} released after error: {data.error}")
+    return {"status": "released", "job_id": job_id}
+
+@app.get("/api/queue")
+async def get_queue_stats(current_user: dict = Depends(get_current_user)):
+    """Get processing queue counts by state, plus how many processors are long-polling for work"""
+    return {**db.get_queue_stats(), "waiting_workers": len(job_waiters)}
+
+@app.get("/api/proxies")
+async def list_proxies(enabled: Optional[bool] = None, current_user: dict = Depends(get_current_user)):
+    """Proxy pool used by local scrapers for keywords without their own proxy"""
+    proxies = db.get_proxies(enabled_only=bool(enabled))
+    for proxy in proxies:
+        proxy['display'] = parse_proxy(proxy['url']).display
+    return {"proxies": proxies}
+
+@app.post("/api/proxies")
+async def add_proxy(data: ProxyCreate, current_user: dict = Depends(get_current_user)):
+    """Add a proxy to the pool; the URL is validated and stored in canonical form"""
+    if data.max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1")
+    url = clean_proxy(data.url)
+    if url is None:
+        raise HTTPException(status_code=400, detail="url is required")
+    proxy_id = db.add_proxy(url, data.label, data.max_concurrency, data.enabled)
+    if proxy_id is None:
+        raise HTTPException(status_code=400, detail="Proxy is already in the pool")
+    return {"id": proxy_id, "message": "Proxy added successfully"}
+
+@app.put("/api/proxies/{proxy_id}")
+async def update_proxy(proxy_id: int, data: ProxyUpdate, current_user: dict = Depends(get_current_user)):
+    """Relabel, resize or enable/disable a pooled proxy"""
+    if data.max_concurrency is not None and data.max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1")
+    if not db.update_proxy(proxy_id, **data.model_dump()):
+        raise HTTPException(status_code=404, detail="Proxy not found")
+    return {"message": "Proxy updated successfully"}
+
+@app.delete("/api/proxies/{proxy_id}")
+async def delete_proxy(proxy_id: int, current_user: dict = Depends(get_current_user)):
+    """Remove a proxy from the pool"""
+    if not db.delete_proxy(proxy_id):
+        raise HTTPException(status_code=404, detail="Proxy not found")
+    return {"message": "Proxy deleted successfully"}
+
 @app.get("/api/history/{keyword_id}")
 async def get_history(keyword_id: int, current_user: dict = Depends(get_current_user)):
     """Get position history for a keyword"""
     history = db.get_position_history(keyword_id)
     return {"keyword_id": keyword_id, "history": history}
 
+@app.get("/api/history/{keyword_id}/resolve")
+async def resolve_history(keyword_id: int, url: Optional[str] = None, limit: int = 20,
+                          current_user: dict = Depends(get_current_user)):
+    """
+    Position of any URL in the stored result lists of a keyword's search, without
+    scraping again. Defaults to the keyword's tracked URL, e.g. after it was edited.
+    """
+    stored = db.get_serp_snapshots(keyword_id, limit=min(max(limit, 1), 200))
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Keyword not found")
+    url = url or stored['url']
+    
+    matcher = UrlMatcher([url])
+    history = []
+    for snapshot in stored['snapshots']:
+        position = matcher.resolve(snapshot['urls']).get(0)
+        history.append({
+            "checked_at": snapshot['checked_at'],
+            "position": position,
+            "matched_url": snapshot['urls'][position - 1] if position else None,
+            # A miss only holds down to the depth the search reached
+            "search_depth": position or snapshot['search_depth'],
+            "results": len(snapshot['urls']),
+        })
+    return {"keyword_id": keyword_id, "url": url, "history": history}
+
 @app.delete("/api/keyword/{keyword_id}")
 async def delete_keyword(keyword_id: int, current_user: dict = Depends(get_current_user)):
     """Delete a tracked keyword"""
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+
+from proxy_pool import parse_proxy
+
+logger = logging.getLogger(__name__)
+
+# Part of every extension's address: bump it when the files below change so old builds are not reused
+EXTENSION_VERSION = 1
+
+MANIFEST_JSON = """
+{
+    "version": "1.0.0",
+    "manifest_version": 2,
+    "name": "Chrome Proxy",
+    "permissions": [
+        "proxy",
+        "tabs",
+        "unlimitedStorage",
+        "storage",
+        "<all_urls>",
+        "webRequest",
+        "webRequestBlocking"
+    ],
+    "background": {
+        "scripts": ["background.js"]
+    },
+    "minimum_chrome_version":"22.0.0"
+}
+"""
+
+BACKGROUND_JS = """
+var config = {
+    mode: "fixed_servers",
+    rules: {
+      singleProxy: {
+        scheme: %s,
+        host: %s,
+        port: %d
+      },
+      bypassList: ["localhost"]
+    }
+  };
+
+chrome.proxy.settings.set({value: config, scope: "regular"}, function() {});
+
+function callbackFn(details) {
+    return {
+        authCredentials: {
+            username: %s,
+            password: %s
+        }
+    };
+}
+
+chrome.webRequest.onAuthRequired.addListener(
+            callbackFn,
+            {urls: ["<all_urls>"]},
+            ['blocking']
+);
+"""
+
+
+def extension_files(spec):
+    """
+    The files of a Chrome extension that routes through the proxy and answers its
+    authentication (Chrome has no flag for proxy credentials). {filename: content}
+    """
+    # Strings go into the script as JSON literals, so quotes in a password cannot break it
+    background_js = BACKGROUND_JS % (
+        json.dumps(spec.scheme), json.dumps(spec.host), spec.port,
+        json.dumps(spec.username), json.dumps(spec.password or '')
+    )
+    return {'manifest.json': MANIFEST_JSON, 'background.js': background_js}
+
+
+class ProxyExtensionCache:
+    """
+    Proxy-auth extensions on disk, built once per proxy and shared.
+
+    Each extension lives in a directory named after a hash of the proxy URL
+    (credentials included, never written in clear in the name) and
+    EXTENSION_VERSION, so every session, worker and processor on the machine
+    that uses the same proxy loads the same directory. Builds are written to
+    a staging directory and renamed into place, so a directory that exists is
+    complete.
+
+    acquire()/release() count the browsers using each extension in this
+    process. prune() deletes the extensions of proxies that are no longer
+    configured, once nothing here uses them and none has been acquired
+    (by any process) for `grace` seconds.
+    """
+
+    def __init__(self, root=None, grace=None):
+        self.root = root or os.getenv('PROXY_EXTENSION_DIR') or os.path.join(tempfile.gettempdir(), 'rank_tracker_proxy_extensions')
+        self.grace = grace if grace is not None else float(os.getenv('PROXY_EXTENSION_GC_GRACE', '3600'))
+        self._refs = {}  # digest -> browsers in this process using the extension
+        self._lock = threading.Lock()
+
+        self.built = 0
+        self.reused = 0
+
+    @staticmethod
+    def digest(spec):
+        return hashlib.sha256(f"{EXTENSION_VERSION}\n{spec.url}".encode()).hexdigest()[:24]
+
+    def acquire(self, spec):
+        """
+        Directory of the extension for `spec` (a ProxySpec with credentials), built if
+        missing. Pass it to release() once the browser that loaded it has quit.
+        """
+        digest = self.digest(spec)
+        path = os.path.join(self.root, digest)
+        with self._lock:
+            if os.path.isdir(path):
+                self.reused += 1
+            else:
+                self._build(spec, path)
+                self.built += 1
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+        try:
+            # The mtime tells prune() in other processes that the extension is in use
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def _build(self, spec, path):
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.build-', dir=self.root)
+        try:
+            for name, content in extension_files(spec).items():
+                with open(os.path.join(staging, name), 'w') as f:
+                    f.write(content)
+            try:
+                os.rename(staging, path)
+            except OSError:
+                # Another processor built the same extension first; its copy is identical
+                if not os.path.isdir(path):
+                    raise
+        finally:
+            if os.path.isdir(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+        logger.info(f"Built proxy extension for {spec.display} at: {path}")
+
+    def release(self, path):
+        """The browser that acquired `path` has quit"""
+        digest = os.path.basename(path)
+        with self._lock:
+            if self._refs.get(digest, 0) > 1:
+                self._refs[digest] -= 1
+            else:
+                self._refs.pop(digest, None)
+
+    def prune(self, keep):
+        """
+        Delete extensions (and abandoned builds) for proxies not in `keep` (proxy URLs or
+        ProxySpecs). Extensions in use here or acquired within `grace` seconds stay, so
+        proxies pinned to single keywords are only rebuilt after a quiet spell.
+        Returns the number of directories removed.
+        """
+        keep_digests = set()
+        for proxy in keep:
+            if not proxy:
+                continue
+            try:
+                spec = parse_proxy(proxy) if isinstance(proxy, str) else proxy
+            except ValueError:
+                continue
+            keep_digests.add(self.digest(spec))
+
+        removed = 0
+        now = time.time()
+        with self._lock:
+            try:
+                names = os.listdir(self.root)
+            except FileNotFoundError:
+                return 0
+            for name in names:
+                if name in keep_digests or self._refs.get(name):
+                    continue
+                path = os.path.join(self.root, name)
+                try:
+                    if now - os.path.getmtime(path) < self.grace:
+                        continue
+                    shutil.rmtree(path)
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove proxy extension {path}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} unused proxy extension(s)")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {'built': self.built, 'reused': self.reused, 'in_use': sum(self._refs.values())}
+
+
+# Shared by every scraper and browser pool in the process
+extension_cache = ProxyExtensionCache()
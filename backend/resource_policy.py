@@ -0,0 +1,197 @@
+import os
+import json
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_POLICIES = ('off', 'lean', 'strict')
+
+# File types a results page never needs. Blocked URL patterns match the whole URL, so each
+# extension also gets a '?*' form for URLs with a query string (e.g. '...png?w=1'); '*.png*'
+# would also catch a search whose own URL contains '.png' (a query for 'logo.png').
+BLOCKED_EXTENSIONS = (
+    'png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'ico', 'bmp',
+    'woff', 'woff2', 'ttf', 'otf',
+    'mp4', 'webm', 'mp3', 'm4a',
+)
+
+# What a results page loads but the scraper never looks at: images, thumbnails, favicons,
+# fonts, media, ads and analytics. Google's own page scripts stay, so the page behaves as usual.
+LEAN_BLOCKED_URLS = [pattern for extension in BLOCKED_EXTENSIONS for pattern in (f'*.{extension}', f'*.{extension}?*')] + [
+    '*://encrypted-tbn*.gstatic.com/*',
+    '*://*.gstatic.com/faviconV2*',
+    '*://fonts.gstatic.com/*',
+    '*://fonts.googleapis.com/*',
+    '*://*.ytimg.com/*',
+    '*://*.doubleclick.net/*',
+    '*://*.googlesyndication.com/*',
+    '*://*.googleadservices.com/*',
+    '*://*.google-analytics.com/*',
+    '*://*.googletagmanager.com/*',
+]
+# Also third-party widgets around the results (account bar, YouTube, Maps, profile pictures)
+STRICT_BLOCKED_URLS = LEAN_BLOCKED_URLS + [
+    '*://www.gstatic.com/og/*',
+    '*://apis.google.com/*',
+    '*://*.youtube.com/*',
+    '*://*.googleusercontent.com/*',
+    '*://maps.googleapis.com/*',
+    '*://maps.gstatic.com/*',
+]
+
+
+class ResourcePolicy:
+    """
+    Which requests a results page may make, enforced in the browser over CDP.
+
+    'lean' blocks images, fonts, media, ads and analytics; 'strict' also
+    blocks third-party widgets; 'off' loads everything. Blocked requests are
+    never sent, so they cost no proxy traffic. SCRAPER_BLOCK_URLS adds more
+    patterns (comma-separated, '*' wildcards). While a CAPTCHA is being
+    solved the policy is relaxed so the challenge renders in full.
+
+    With `report` on, each page's transferred bytes, finished requests and
+    blocked requests (by resource type) are read from Chrome's performance
+    log. Blocked requests are never fetched, so their size is unknown: runs
+    with nothing blocked record their average page as a baseline
+    (SCRAPER_TRAFFIC_BASELINE), and runs with a blocklist report the bytes
+    saved per page against it.
+    """
+
+    def __init__(self, name=None, extra_urls=None, report=None, baseline_path=None):
+        self.name = (name or os.getenv('SCRAPER_RESOURCE_POLICY', 'lean')).lower()
+        if self.name not in RESOURCE_POLICIES:
+            raise ValueError(f"Unknown resource policy '{self.name}', expected one of {RESOURCE_POLICIES}")
+        if extra_urls is None:
+            extra_urls = [url.strip() for url in os.getenv('SCRAPER_BLOCK_URLS', '').split(',') if url.strip()]
+        self.report = report if report is not None else os.getenv('SCRAPER_TRAFFIC_REPORT', '1') == '1'
+
+        if self.name == 'off':
+            self.blocked_urls = list(extra_urls)
+        else:
+            base = STRICT_BLOCKED_URLS if self.name == 'strict' else LEAN_BLOCKED_URLS
+            self.blocked_urls = base + list(extra_urls)
+
+        self.baseline_path = (baseline_path or os.getenv('SCRAPER_TRAFFIC_BASELINE')
+                              or os.path.join(tempfile.gettempdir(), 'rank_tracker_traffic_baseline.json'))
+        self.baseline = self._load_baseline() if self.report else None
+
+    @property
+    def enabled(self):
+        return bool(self.blocked_urls)
+
+    def configure_options(self, options):
+        """Ask ChromeDriver for the performance log the traffic report is read from"""
+        if self.report:
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    def apply(self, driver):
+        """Install the blocklist in a new browser. Returns False if the driver has no CDP."""
+        if not self.enabled:
+            return True
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_urls})
+            logger.info(f"Resource policy '{self.name}': blocking {len(self.blocked_urls)} URL pattern(s)")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not apply resource policy '{self.name}': {e}")
+            return False
+
+    def relax(self, driver):
+        """Let everything through again (CAPTCHA challenges need their images)"""
+        if not self.enabled:
+            return
+        try:
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+        except Exception as e:
+            logger.debug(f"Could not relax resource policy: {e}")
+
+    def page_traffic(self, driver):
+        """
+        Network use since the previous call: {bytes, requests, blocked, blocked_types}
+        (blocked_types: {resource type: count}), or None when reporting is off or the
+        driver keeps no performance log.
+        """
+        if not self.report:
+            return None
+        try:
+            entries = driver.get_log('performance')
+        except Exception as e:
+            logger.debug(f"Performance log unavailable: {e}")
+            return None
+
+        traffic = {'bytes': 0, 'requests': 0, 'blocked': 0, 'blocked_types': {}}
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = message.get('method')
+            if method == 'Network.loadingFinished':
+                traffic['bytes'] += int(message['params'].get('encodedDataLength') or 0)
+                traffic['requests'] += 1
+            elif method == 'Network.loadingFailed' and message['params'].get('blockedReason'):
+                traffic['blocked'] += 1
+                kind = message['params'].get('type') or 'Other'
+                traffic['blocked_types'][kind] = traffic['blocked_types'].get(kind, 0) + 1
+        return traffic
+
+    def _load_baseline(self):
+        try:
+            with open(self.baseline_path) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return baseline if isinstance(baseline, dict) and baseline.get('pages') else None
+
+    def record_baseline(self, traffic):
+        """
+        Keep `traffic` (totals with 'pages', from page_traffic()) as the unblocked reference
+        for savings(). Only taken while nothing is blocked; other calls are ignored.
+        """
+        if self.enabled or not traffic.get('pages'):
+            return
+        baseline = {'pages': traffic['pages'], 'bytes': traffic['bytes'], 'requests': traffic['requests']}
+        staging = f"{self.baseline_path}.{os.getpid()}.tmp"
+        try:
+            with open(staging, 'w') as f:
+                json.dump(baseline, f)
+            os.replace(staging, self.baseline_path)
+            self.baseline = baseline
+        except OSError as e:
+            logger.warning(f"Could not record traffic baseline at {self.baseline_path}: {e}")
+
+    def savings(self, traffic):
+        """
+        What blocking saved per results page, from totals with 'pages': {baseline_bytes, bytes_saved,
+        requests_saved, blocked_types: {resource type: per page}}. The byte and request figures
+        are None until a run without blocking has recorded a baseline.
+        """
+        pages = traffic.get('pages') or 0
+        if not pages:
+            return None
+        saving = {
+            'baseline_bytes': None,
+            'bytes_saved': None,
+            'requests_saved': None,
+            'blocked_types': {kind: count / pages for kind, count in traffic.get('blocked_types', {}).items()},
+        }
+        if self.baseline:
+            baseline_bytes = self.baseline['bytes'] / self.baseline['pages']
+            saving['baseline_bytes'] = baseline_bytes
+            saving['bytes_saved'] = baseline_bytes - traffic['bytes'] / pages
+            saving['requests_saved'] = self.baseline['requests'] / self.baseline['pages'] - traffic['requests'] / pages
+        return saving
+
+
+def add_traffic(total, traffic):
+    """Add page_traffic() counts (or another running total) into a running total"""
+    for key, value in traffic.items():
+        if key == 'blocked_types':
+            types = total.setdefault('blocked_types', {})
+            for kind, count in value.items():
+                types[kind] = types.get(kind, 0) + count
+        else:
+            total[key] = total.get(key, 0) + value
@@ -0,0 +1,200 @@
+import os
+import time
+import random
+import logging
+import bisect
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_delay_range(value):
+    """Parse '8-15' (or a single number) into a (min, max) tuple of seconds"""
+    if '-' in value:
+        low, high = value.split('-', 1)
+        return float(low), float(high)
+    return float(value), float(value)
+
+
+class RequestScheduler:
+    """
+    Shared pacing for Google requests made by concurrent workers.
+
+    Enforces a minimum gap between any two requests (global rate) and a
+    random 8-15 s style cool-off between requests on the same proxy
+    (per-proxy rate). Slots are reserved up front, so any number of
+    workers can ask for one at once without bursting. A slot far in the
+    future (a proxy resting after a CAPTCHA) only keeps other requests out
+    of the `global_interval` around it, not out of everything before it.
+
+    CAPTCHAs are recorded per proxy and per exit IP. Each one puts the proxy
+    on an exponential cooldown (doubling per consecutive CAPTCHA, reset by a
+    clean search), and a proxy whose challenge rate over the rolling window
+    reaches `max_captcha_rate` is taken out of rotation for `bench_seconds`.
+    pick() routes work to the healthiest proxy.
+    """
+
+    def __init__(self, global_interval=None, proxy_delay=None, captcha_window=None, cooldown_base=None,
+                 cooldown_max=None, max_captcha_rate=None, min_samples=None, bench_seconds=None):
+        if global_interval is None:
+            global_interval = float(os.getenv('SCRAPER_GLOBAL_INTERVAL', '2'))
+        if proxy_delay is None:
+            proxy_delay = _parse_delay_range(os.getenv('SCRAPER_PROXY_DELAY', '8-15'))
+
+        self.global_interval = global_interval
+        self.proxy_delay = proxy_delay
+        self.captcha_window = captcha_window or float(os.getenv('CAPTCHA_WINDOW_SECONDS', '3600'))
+        self.cooldown_base = cooldown_base or float(os.getenv('CAPTCHA_COOLDOWN_BASE', '120'))
+        self.cooldown_max = cooldown_max or float(os.getenv('CAPTCHA_COOLDOWN_MAX', '3600'))
+        self.max_captcha_rate = max_captcha_rate or float(os.getenv('CAPTCHA_MAX_RATE', '0.3'))
+        self.min_samples = min_samples or int(os.getenv('CAPTCHA_MIN_SAMPLES', '5'))
+        self.bench_seconds = bench_seconds or float(os.getenv('CAPTCHA_BENCH_SECONDS', '21600'))
+
+        self._lock = threading.Lock()
+        self._slots = []  # start times of reserved requests, sorted
+        self._next_proxy = {}
+        # Rolling (time, captcha) outcomes per proxy and per exit IP
+        self._outcomes = {}
+        self._ip_outcomes = {}
+        self._strikes = {}  # consecutive CAPTCHAs per proxy
+        self._benched_until = {}
+        self._exit_ips = {}  # proxy -> exit IP last reported by Google
+
+    def _next_slot(self, key, now):
+        """Earliest start for proxy `key` that is at least global_interval away from every reserved slot"""
+        while self._slots and self._slots[0] <= now - self.global_interval:
+            self._slots.pop(0)
+        start = max(now, self._next_proxy.get(key, 0.0))
+        for slot in self._slots:
+            if slot + self.global_interval <= start:
+                continue
+            if slot >= start + self.global_interval:
+                break
+            start = slot + self.global_interval
+        return start
+
+    def peek(self, proxy):
+        """Seconds until proxy could send its next request, without reserving the slot"""
+        with self._lock:
+            now = time.monotonic()
+            return self._next_slot(proxy or '', now) - now
+
+    def reserve(self, proxy):
+        """Reserve the next request slot for proxy and return how many seconds to wait for it"""
+        key = proxy or ''
+        with self._lock:
+            now = time.monotonic()
+            start = self._next_slot(key, now)
+            bisect.insort(self._slots, start)
+            self._next_proxy[key] = start + random.uniform(*self.proxy_delay)
+            return start - now
+
+    def done(self, proxy):
+        """Start the proxy's cool-off once its request has actually finished"""
+        key = proxy or ''
+        with self._lock:
+            cool_off = time.monotonic() + random.uniform(*self.proxy_delay)
+            self._next_proxy[key] = max(self._next_proxy.get(key, 0.0), cool_off)
+
+    def _trim(self, outcomes, now):
+        while outcomes and outcomes[0][0] < now - self.captcha_window:
+            outcomes.popleft()
+
+    @staticmethod
+    def _rate(outcomes):
+        return sum(1 for _, captcha in outcomes if captcha) / len(outcomes) if outcomes else 0.0
+
+    def record(self, proxy, captcha=False, exit_ip=None):
+        """
+        Record how a search on proxy went. A CAPTCHA (solved or not) starts a cooldown,
+        or benches the proxy when its challenge rate is too high. Returns the seconds
+        the proxy now has to rest (0 after a clean search).
+        """
+        key = proxy or ''
+        with self._lock:
+            now = time.monotonic()
+            outcomes = self._outcomes.setdefault(key, deque())
+            outcomes.append((now, captcha))
+            self._trim(outcomes, now)
+            if exit_ip:
+                self._exit_ips[key] = exit_ip
+                ip_outcomes = self._ip_outcomes.setdefault(exit_ip, deque())
+                ip_outcomes.append((now, captcha))
+                self._trim(ip_outcomes, now)
+
+            if not captcha:
+                self._strikes[key] = 0
+                return 0.0
+
+            strikes = self._strikes.get(key, 0) + 1
+            self._strikes[key] = strikes
+            rest = min(self.cooldown_base * 2 ** (strikes - 1), self.cooldown_max)
+            rate = self._rate(outcomes)
+            if len(outcomes) >= self.min_samples and rate >= self.max_captcha_rate:
+                rest = max(rest, self.bench_seconds)
+                self._benched_until[key] = now + rest
+                logger.warning(f"Proxy {_display(proxy)} out of rotation for {rest / 60:.0f} min "
+                               f"({rate:.0%} CAPTCHA rate over the last {len(outcomes)} searches)")
+            else:
+                logger.warning(f"Proxy {_display(proxy)} cooling down for {rest:.0f}s after CAPTCHA #{strikes} in a row")
+
+            # Proxies leaving through the same exit IP are burned with it
+            cooled = [key] + [other for other, ip in self._exit_ips.items() if exit_ip and ip == exit_ip and other != key]
+            for other in cooled:
+                self._next_proxy[other] = max(self._next_proxy.get(other, 0.0), now + rest)
+            return rest
+
+    def pick(self, proxies, weights=None):
+        """
+        The proxy to send the next search through. Out-of-rotation proxies are skipped
+        unless every one is benched. Among proxies free right now, `weights` ({proxy:
+        weight}) makes a weighted random choice, otherwise the first wins; when none is
+        free, the one free soonest does.
+        """
+        if not proxies:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            candidates = [proxy for proxy in proxies if self._benched_until.get(proxy or '', 0.0) <= now]
+            if not candidates:
+                candidates = sorted(proxies, key=lambda proxy: self._benched_until.get(proxy or '', 0.0))[:1]
+            ready = [proxy for proxy in candidates if self._next_proxy.get(proxy or '', 0.0) <= now]
+            if ready and weights:
+                return random.choices(ready, weights=[weights.get(proxy, 1.0) for proxy in ready])[0]
+            if ready:
+                return ready[0]
+            return min(candidates, key=lambda proxy: self._next_proxy.get(proxy or '', 0.0))
+
+    def captcha_stats(self):
+        """Rolling challenge rates: {'proxies': {proxy: {...}}, 'exit_ips': {ip: {...}}}"""
+        with self._lock:
+            now = time.monotonic()
+            proxies = {}
+            for key, outcomes in self._outcomes.items():
+                self._trim(outcomes, now)
+                proxies[key] = {
+                    'searches': len(outcomes),
+                    'captchas': sum(1 for _, captcha in outcomes if captcha),
+                    'rate': round(self._rate(outcomes), 3),
+                    'strikes': self._strikes.get(key, 0),
+                    'resting_for': max(0.0, round(self._next_proxy.get(key, 0.0) - now)),
+                    'benched': self._benched_until.get(key, 0.0) > now,
+                    'exit_ip': self._exit_ips.get(key),
+                }
+            exit_ips = {}
+            for ip, outcomes in self._ip_outcomes.items():
+                self._trim(outcomes, now)
+                exit_ips[ip] = {
+                    'searches': len(outcomes),
+                    'captchas': sum(1 for _, captcha in outcomes if captcha),
+                    'rate': round(self._rate(outcomes), 3),
+                }
+            return {'proxies': proxies, 'exit_ips': exit_ips}
+
+
+def _display(proxy):
+    """Proxy for logs, without credentials"""
+    if not proxy:
+        return 'direct'
+    return proxy.split('@')[1] if '@' in proxy else proxy
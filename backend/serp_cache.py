@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class SerpCache:
+    """
+    Recently fetched SERPs keyed by (keyword, country, depth).
+
+    A snapshot is the ordered list of organic result URLs (with the page each
+    was on) and the time it was fetched. Snapshots stay usable for `ttl`
+    seconds. Recent ones are kept in memory (LRU, `max_entries`) and all of
+    them in a SQLite file, so repeat checks survive a processor restart and
+    are shared by processors on the same machine.
+
+    A search that stopped early because its targets were found stores a
+    partial snapshot: it can only answer for URLs that appear in it.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, db_path=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('SERP_CACHE_TTL', '900'))
+        self.max_entries = max_entries or int(os.getenv('SERP_CACHE_SIZE', '256'))
+        self.db_path = db_path if db_path is not None else os.getenv('SERP_CACHE_DB', 'serp_cache.db')
+
+        self._memory = OrderedDict()  # key -> snapshot
+        self._lock = threading.Lock()
+        self._conn = None
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if self.enabled and self.db_path:
+            self._open_db()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _open_db(self):
+        try:
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS serp_cache (
+                    keyword TEXT NOT NULL,
+                    country TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    complete INTEGER NOT NULL,
+                    urls TEXT NOT NULL,
+                    pages TEXT NOT NULL,
+                    PRIMARY KEY (keyword, country, depth)
+                )
+            ''')
+            # Expired snapshots are never read again
+            self._conn.execute('DELETE FROM serp_cache WHERE fetched_at < ?', (time.time() - self.ttl,))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"SERP cache database unavailable, caching in memory only: {e}")
+            self._conn = None
+
+    @staticmethod
+    def make_key(keyword, country, depth):
+        return (keyword.strip().lower(), (country or '').lower(), int(depth))
+
+    def _fresh(self, snapshot, now):
+        return now - snapshot['fetched_at'] < self.ttl
+
+    def _remember(self, key, snapshot):
+        """Put a snapshot in the in-memory tier, evicting the least recently used"""
+        self._memory[key] = snapshot
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, keyword, country, depth, now=None):
+        """
+        Fresh snapshot for the search, or None.
+
+        A snapshot is {urls, pages, complete, fetched_at, tier}; complete is
+        False when the search stopped before reaching `depth`. Lookups are not
+        counted here, see record().
+        """
+        if not self.enabled:
+            return None
+        now = now or time.time()
+        key = self.make_key(keyword, country, depth)
+
+        with self._lock:
+            snapshot = self._memory.get(key)
+            if snapshot is not None:
+                if self._fresh(snapshot, now):
+                    self._memory.move_to_end(key)
+                    return dict(snapshot, tier='memory')
+                del self._memory[key]
+
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    'SELECT fetched_at, complete, urls, pages FROM serp_cache WHERE keyword = ? AND country = ? AND depth = ?',
+                    key
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"SERP cache read failed: {e}")
+                return None
+            if row is None:
+                return None
+
+            snapshot = {
+                'fetched_at': row[0],
+                'complete': bool(row[1]),
+                'urls': json.loads(row[2]),
+                'pages': json.loads(row[3]),
+            }
+            if not self._fresh(snapshot, now):
+                return None
+            self._remember(key, snapshot)
+            return dict(snapshot, tier='disk')
+
+    def put(self, keyword, country, depth, urls, pages, complete, fetched_at=None):
+        """Store the result URLs of a search (pages[i] is the results page urls[i] was on)"""
+        if not self.enabled or not urls:
+            return
+        key = self.make_key(keyword, country, depth)
+        snapshot = {
+            'fetched_at': fetched_at or time.time(),
+            'complete': bool(complete),
+            'urls': list(urls),
+            'pages': list(pages),
+        }
+
+        with self._lock:
+            self._remember(key, snapshot)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO serp_cache (keyword, country, depth, fetched_at, complete, urls, pages) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    key + (snapshot['fetched_at'], int(snapshot['complete']),
+                           json.dumps(snapshot['urls']), json.dumps(snapshot['pages']))
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"SERP cache write failed: {e}")
+
+    def record(self, snapshot):
+        """Count a lookup: a snapshot that answered the check is a hit, anything else a miss"""
+        with self._lock:
+            if snapshot is None:
+                self.misses += 1
+                return
+            self.hits += 1
+            if snapshot.get('tier') == 'disk':
+                self.disk_hits += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'entries': len(self._memory),
+                'ttl': self.ttl,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Offline Google SERP parser.
+
+Applies the scraper's extraction rules to saved HTML instead of a live
+WebDriver DOM, so extraction can be tuned and regression-checked without
+hitting Google:
+
+    python serp_parser.py parse no_results.html              # print organic URLs
+    python serp_parser.py import no_results.html --name bike_shops_ca
+    python serp_parser.py check                              # re-parse every fixture
+
+Fixtures live in fixtures/serp/ as <name>.html plus <name>.json holding the
+expected organic URLs. `import` writes the JSON from the current parser; review
+it against the screenshot before committing.
+
+Parsing uses selectolax (Lexbor), an optional dependency:
+    pip install selectolax
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+from urllib.parse import urljoin
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'serp')
+
+# Result containers are tried in order; the first selector with any non-empty container wins
+RESULT_CONTAINER_SELECTORS = [
+    'div.g:not(.related-question-pair):not(.kp-blk)',
+    'div[data-sokoban-container]',
+    'div.Gx5Zad.fP1Qef',
+    'div[jscontroller][data-hveid]',
+]
+# Main link of a result, most specific first
+RESULT_LINK_SELECTORS = [
+    'div.yuRUbf > a',
+    'a[jsname="UWckNb"]',
+    'h3 > a',
+    'a[href^="http"]',
+]
+EXCLUDED_CONTAINER_CLASSES = ['related-question', 'kp-blk', 'knowledge', 'osrp-blk']
+PEOPLE_ALSO_ASK_SELECTOR = 'div[jsname="yEVEwb"]'
+
+
+def is_ad_text(text):
+    return 'Ad' in text or 'Sponsored' in text
+
+
+def is_result_href(href, cache_marker='webcache.googleusercontent.com'):
+    """True for external links; Google's own pages and cached copies are not results"""
+    return bool(href and
+                href.startswith('http') and
+                'google.com' not in href and
+                'google.co.' not in href and
+                cache_marker not in href)
+
+
+def organic_urls(data):
+    """
+    Turn extracted entries ({selector, results: [{href, title, type, is_ad}]})
+    into the ordered list of organic result URLs.
+    """
+    urls = []
+    for entry in data['results']:
+        if entry.get('is_ad'):
+            continue
+        # The all-links fallback has always used the looser cache filter
+        cache_marker = 'webcache' if entry.get('type') == 'link' else 'webcache.googleusercontent.com'
+        if is_result_href(entry.get('href'), cache_marker):
+            urls.append(entry['href'])
+    return urls
+
+
+def _text(node):
+    return node.text(deep=True, separator=' ', strip=True) if node is not None else ''
+
+
+def _closest_div(node):
+    node = node.parent
+    while node is not None and node.tag != 'div':
+        node = node.parent
+    return node
+
+
+def parse_serp(html, base_url='https://www.google.com/search'):
+    """
+    Extract result entries from SERP HTML.
+
+    Returns the same structure as the scraper's in-browser extraction script:
+    {selector, results: [{href, title, type, is_ad}]}. Relative hrefs are
+    resolved against base_url, as a browser would.
+    """
+    if LexborHTMLParser is None:
+        raise RuntimeError("selectolax is not installed (pip install selectolax)")
+
+    tree = LexborHTMLParser(html)
+    # Script and style bodies are not visible text
+    tree.strip_tags(['script', 'style', 'noscript'])
+
+    def href_of(link):
+        return urljoin(base_url, link.attributes.get('href') or '')
+
+    for selector in RESULT_CONTAINER_SELECTORS:
+        containers = [node for node in tree.css(selector) if _text(node)]
+        if not containers:
+            continue
+
+        results = []
+        for container in containers:
+            if container.css_first(PEOPLE_ALSO_ASK_SELECTOR) is not None:
+                continue
+            classes = container.attributes.get('class') or ''
+            if any(pattern in classes for pattern in EXCLUDED_CONTAINER_CLASSES):
+                continue
+
+            link = None
+            for link_selector in RESULT_LINK_SELECTORS:
+                link = container.css_first(link_selector)
+                if link is not None:
+                    break
+            if link is None:
+                continue
+
+            heading = container.css_first('h3')
+            results.append({
+                'href': href_of(link),
+                'title': _text(heading if heading is not None else link),
+                'type': selector,
+                'is_ad': is_ad_text(_text(container)),
+            })
+        return {'selector': selector, 'results': results}
+
+    search = tree.css_first('div#search')
+    if search is None:
+        return {'selector': None, 'results': []}
+    return {'selector': None, 'results': [
+        {
+            'href': href_of(link),
+            'title': _text(link),
+            'type': 'link',
+            'is_ad': is_ad_text(_text(_closest_div(link))),
+        }
+        for link in search.css('a[href]')
+    ]}
+
+
+def extract_organic_urls(html, base_url='https://www.google.com/search'):
+    """Ordered organic result URLs, as GoogleRankScraper._extract_results_from_page returns them"""
+    return organic_urls(parse_serp(html, base_url))
+
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    """Yield (name, html, expected_urls or None) for every saved SERP"""
+    for filename in sorted(os.listdir(fixture_dir)):
+        if not filename.endswith('.html'):
+            continue
+        name = filename[:-5]
+        with open(os.path.join(fixture_dir, filename), encoding='utf-8') as f:
+            html = f.read()
+        expected = None
+        expected_path = os.path.join(fixture_dir, f"{name}.json")
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding='utf-8') as f:
+                expected = json.load(f)['organic_urls']
+        yield name, html, expected
+
+
+def import_fixture(html_path, name, fixture_dir=FIXTURE_DIR):
+    """Copy a page dump into the fixture corpus and record what the parser currently extracts"""
+    os.makedirs(fixture_dir, exist_ok=True)
+    target = os.path.join(fixture_dir, f"{name}.html")
+    if os.path.abspath(html_path) != os.path.abspath(target):
+        shutil.copyfile(html_path, target)
+    with open(target, encoding='utf-8') as f:
+        urls = extract_organic_urls(f.read())
+    with open(os.path.join(fixture_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump({'source': os.path.basename(html_path), 'organic_urls': urls}, f, indent=2)
+        f.write('\n')
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    parse_cmd = commands.add_parser('parse', help='print the organic URLs found in an HTML file')
+    parse_cmd.add_argument('html')
+    import_cmd = commands.add_parser('import', help='add a page dump (e.g. no_results.html) to the fixtures')
+    import_cmd.add_argument('html')
+    import_cmd.add_argument('--name', required=True, help='fixture name, e.g. bike_shops_ca')
+    commands.add_parser('check', help='re-parse every fixture and compare with its expected URLs')
+    args = parser.parse_args()
+
+    if args.command == 'parse':
+        with open(args.html, encoding='utf-8') as f:
+            for position, url in enumerate(extract_organic_urls(f.read()), 1):
+                print(f"{position:3}. {url}")
+        return 0
+
+    if args.command == 'import':
+        urls = import_fixture(args.html, args.name)
+        print(f"Saved fixture '{args.name}' with {len(urls)} organic result(s) - review {args.name}.json")
+        return 0
+
+    failures = 0
+    for name, html, expected in load_fixtures():
+        urls = extract_organic_urls(html)
+        if expected is None:
+            print(f"?  {name}: {len(urls)} result(s), no expected URLs recorded")
+        elif urls == expected:
+            print(f"ok {name}: {len(urls)} result(s)")
+        else:
+            failures += 1
+            print(f"!! {name}: expected {len(expected)} result(s), got {len(urls)}")
+            for index in range(max(len(expected), len(urls))):
+                want = expected[index] if index < len(expected) else None
+                got = urls[index] if index < len(urls) else None
+                if want != got:
+                    print(f"   first difference at #{index + 1}: expected {want}, got {got}")
+                    break
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
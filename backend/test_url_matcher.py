@@ -0,0 +1,105 @@
+"""
+Tests for UrlMatcher: it must resolve result lists to the same positions as
+calling urls_match() on every (result, target) pair.
+
+    cd backend && python -m pytest test_url_matcher.py
+"""
+
+import pytest
+
+from url_matcher import UrlMatcher, urls_match
+
+
+def brute_force(targets, results):
+    """The reference: first position of each target by pairwise urls_match()"""
+    found = {}
+    for index, target in enumerate(targets):
+        for position, url in enumerate(results, 1):
+            if urls_match(url, target):
+                found[index] = position
+                break
+    return found
+
+
+@pytest.mark.parametrize('url', [
+    'https://example.com/shoes/running',
+    'http://www.example.com/shoes/running/',
+    'https://EXAMPLE.com/shoes/running#reviews',
+    'https://example.com/shoes/running?utm_source=google',
+])
+def test_exact_match_after_normalizing(url):
+    assert UrlMatcher(['https://www.example.com/shoes/running']).match(url) == [0]
+
+
+def test_exact_match_finds_every_equal_target():
+    matcher = UrlMatcher(['https://example.com/a-page', 'https://www.example.com/a-page/', 'https://other.org/a-page'])
+    assert matcher.match('https://example.com/a-page') == [0, 1]
+
+
+def test_substring_match_above_80_percent():
+    # 'example.com/shoes/running' is 25 of 27 characters of the longer URLs (93%)
+    matcher = UrlMatcher(['https://example.com/shoes/running'])
+    assert matcher.match('https://example.com/shoes/running-x') == [0]
+    assert matcher.match('https://example.com/shoes/running/x') == [0]
+
+
+def test_substring_match_at_or_below_80_percent():
+    # 20 of 25 characters is exactly 80%, which is not enough
+    matcher = UrlMatcher(['https://example.com/abcdefgh'])
+    assert matcher.match('https://example.com/abcdefgh/1234') == []
+    assert matcher.match('https://example.com/abcdefgh/123') == [0]
+    assert matcher.match('https://example.com/abcdefgh/for-trail-and-road') == []
+
+
+def test_substring_match_needs_more_than_10_characters():
+    # 'a.co/shoes' is 10 characters: too short to match by substring however similar
+    assert UrlMatcher(['https://a.co/shoes']).match('https://a.co/shoesx') == []
+    assert UrlMatcher(['https://ab.co/shoes']).match('https://ab.co/shoesx') == [0]
+
+
+def test_equal_length_urls_only_match_when_equal():
+    matcher = UrlMatcher(['https://example.com/page-a'])
+    assert matcher.match('https://example.com/page-b') == []
+    assert matcher.match('https://example.com/page-a') == [0]
+    assert not urls_match('https://example.com/page-a', 'https://example.com/page-b')
+
+
+def test_empty_urls():
+    matcher = UrlMatcher(['https://example.com/shoes', ''])
+    assert matcher.match('') == [1]
+    assert matcher.match(None) == [1]
+    assert matcher.match('https://example.com/shoes') == [0]
+    assert UrlMatcher([]).match('https://example.com/shoes') == []
+    assert UrlMatcher(['https://example.com/shoes']).resolve(['', None, 'https://example.com/shoes']) == {0: 3}
+
+
+def test_resolve_returns_first_1_based_position_of_each_target():
+    targets = ['https://example.com/shoes', 'https://example.com/boots', 'https://example.com/socks']
+    results = [
+        'https://other.org/',
+        'https://www.example.com/boots/',
+        'https://example.com/shoes',
+        'https://example.com/boots',
+    ]
+    assert UrlMatcher(targets).resolve(results) == {1: 2, 0: 3}
+    assert UrlMatcher(targets).resolve([]) == {}
+
+
+def test_resolve_agrees_with_pairwise_urls_match():
+    targets = [
+        'https://example.com/shoes/running',
+        'https://example.com/page-a',
+        'https://www.example.com/blog/',
+        'https://shop.example.com/shoes/running',
+        '',
+    ]
+    results = [
+        'https://example.com/page-b',
+        'https://example.com/shoes/running/12345',
+        'https://example.com/blog#comments',
+        'https://example.com/shoes/running-x',
+        'https://shop.example.com/shoes/runnin',
+        'https://example.com/page-a/',
+        '',
+    ]
+    assert UrlMatcher(targets).resolve(results) == brute_force(targets, results)
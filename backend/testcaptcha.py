@@ -6,65 +6,12 @@ import time
 import logging
 import requests
 import random
-import os
+
+from transcription import transcribe
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def transcribe_with_whisper(audio_path):
-    """
-    Transcribe audio using OpenAI Whisper API or local model
-    """
-    # Try API first if key is available
-    whisper_api_key = os.getenv('OPENAI_API_KEY')
-    
-    if whisper_api_key:
-        try:
-            logger.info("Using OpenAI Whisper API...")
-            url = "https://api.openai.com/v1/audio/transcriptions"
-            headers = {
-                "Authorization": f"Bearer {whisper_api_key}"
-            }
-            
-            with open(audio_path, 'rb') as audio_file:
-                files = {
-                    'file': ('audio.mp3', audio_file, 'audio/mpeg'),
-                }
-                data = {
-                    'model': 'whisper-1'
-                }
-                
-                response = requests.post(url, headers=headers, files=files, data=data, timeout=30)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    text = result.get('text', '').strip()
-                    return text
-                else:
-                    logger.warning(f"Whisper API error: {response.status_code}, falling back to local")
-                    
-        except Exception as e:
-            logger.warning(f"Whisper API failed: {e}, falling back to local")
-    
-    # Fall back to local Whisper
-    try:
-        import whisper
-        
-        logger.info("Using local Whisper model...")
-        model = whisper.load_model("base")
-        result = model.transcribe(audio_path)
-        text = result["text"].strip()
-        return text
-        
-    except ImportError:
-        logger.error("âš ï¸ Whisper not available!")
-        logger.error("Install with: pip install openai-whisper")
-        logger.error("Or set OPENAI_API_KEY in environment")
-        return None
-    except Exception as e:
-        logger.error(f"Error with local Whisper: {e}")
-        return None
-
 def test_captcha_full_solve():
     """
     Test COMPLETE CAPTCHA solving with VISIBLE browser
@@ -152,9 +99,6 @@ def test_captcha_full_solve():
             input("Press Enter to close...")
             return
         
-        audio_path = "captcha_audio_test.mp3"
-        with open(audio_path, 'wb') as f:
-            f.write(audio_response.content)
         logger.info(f"âœ“ Audio downloaded ({len(audio_response.content)} bytes)")
         
         # ===== STEP 5: Transcribe audio =====
@@ -162,7 +106,7 @@ def test_captcha_full_solve():
         logger.info("STEP 5: Transcribing audio with Whisper...")
         logger.info("=" * 60)
         
-        transcription = transcribe_with_whisper(audio_path)
+        transcription = transcribe(audio_response.content)
         
         if not transcription:
             logger.error("Failed to transcribe audio")
@@ -247,13 +191,6 @@ def test_captcha_full_solve():
         input("Press Enter to close...")
         
     finally:
-        # Cleanup
-        if os.path.exists("captcha_audio_test.mp3"):
-            try:
-                os.remove("captcha_audio_test.mp3")
-            except:
-                pass
-        
         if driver:
             logger.info("Closing browser...")
             driver.quit()
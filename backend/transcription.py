@@ -0,0 +1,199 @@
+"""
+CAPTCHA audio transcription shared by every scraper in the process.
+
+The OpenAI Whisper API is used when OPENAI_API_KEY is set. Otherwise (or
+when the API fails) a local Whisper model is loaded once, on first use, and
+kept resident. Local inference runs on a small bounded pool
+(WHISPER_WORKERS), so concurrent scrapers queue for the one model instead of
+each loading their own.
+
+Audio stays in memory: MP3 bytes are decoded to 16 kHz mono through an
+ffmpeg pipe and handed to the model as an array. TRANSCRIBE_IN_MEMORY=0
+goes through a temporary file instead.
+
+With TRANSCRIBE_SERVER_URL set, local transcription is handed to the
+transcription daemon (transcription_server.py) instead, so the model is
+loaded once per machine rather than once per scraper process.
+WHISPER_MODEL=stub replaces the model with one that always answers
+WHISPER_STUB_TEXT, for tests.
+"""
+
+import io
+import os
+import logging
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
+WHISPER_SAMPLE_RATE = 16000
+TRANSCRIBE_IN_MEMORY = os.getenv('TRANSCRIBE_IN_MEMORY', '1') == '1'
+TRANSCRIBE_SERVER_URL = os.getenv('TRANSCRIBE_SERVER_URL', '').rstrip('/')
+TRANSCRIBE_SERVER_TIMEOUT = float(os.getenv('TRANSCRIBE_SERVER_TIMEOUT', '120'))
+# Load a model in this process when the daemon is unreachable (off: one model per scraper is what the daemon avoids)
+TRANSCRIBE_SERVER_FALLBACK = os.getenv('TRANSCRIBE_SERVER_FALLBACK', '0') == '1'
+
+_model = None
+_model_lock = threading.Lock()
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('WHISPER_WORKERS', '1')),
+    thread_name_prefix='whisper'
+)
+
+
+class StubModel:
+    """Stands in for a Whisper model: same transcribe() interface, fixed answer"""
+
+    def __init__(self, text=''):
+        self.text = text
+
+    def transcribe(self, audio):
+        return {'text': self.text}
+
+
+def set_model(model):
+    """Replace the process-wide model (anything with Whisper's transcribe(audio) -> {'text': ...})"""
+    global _model
+    with _model_lock:
+        _model = model
+
+
+def get_model():
+    """The process-wide local Whisper model, loaded on first use (raises ImportError without openai-whisper)"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None and WHISPER_MODEL == 'stub':
+                _model = StubModel(os.getenv('WHISPER_STUB_TEXT', ''))
+            if _model is None:
+                import whisper
+                logger.info(f"Loading local Whisper model '{WHISPER_MODEL}' (once per process)...")
+                _model = whisper.load_model(WHISPER_MODEL)
+    return _model
+
+
+def preload():
+    """Load the local model in the background so the first CAPTCHA only pays for inference"""
+    if os.getenv('OPENAI_API_KEY') or TRANSCRIBE_SERVER_URL:
+        return None
+    return _executor.submit(_preload)
+
+
+def _preload():
+    try:
+        get_model()
+    except ImportError:
+        logger.warning("Whisper not installed - CAPTCHA audio cannot be transcribed locally")
+    except Exception as e:
+        logger.warning(f"Could not preload Whisper model: {e}")
+
+
+def decode_audio(data, sample_rate=WHISPER_SAMPLE_RATE):
+    """Decode audio bytes (MP3 or anything ffmpeg reads) to a float32 mono array, without touching disk"""
+    import numpy as np
+
+    process = subprocess.run(
+        ['ffmpeg', '-nostdin', '-threads', '0', '-i', 'pipe:0',
+         '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), '-'],
+        input=data, capture_output=True, check=True
+    )
+    return np.frombuffer(process.stdout, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def _transcribe_api(data, api_key):
+    logger.info("Using OpenAI Whisper API...")
+    response = requests.post(
+        "https://api.openai.com/v1/audio/transcriptions",
+        headers={"Authorization": f"Bearer {api_key}"},
+        files={'file': ('audio.mp3', io.BytesIO(data), 'audio/mpeg')},
+        data={'model': 'whisper-1'},
+        timeout=30
+    )
+    if response.status_code != 200:
+        logger.warning(f"Whisper API error: {response.status_code}, falling back to local")
+        return None
+    return response.json().get('text', '').strip()
+
+
+def _transcribe_server(data):
+    response = requests.post(
+        f"{TRANSCRIBE_SERVER_URL}/transcribe",
+        data=data,
+        headers={'Content-Type': 'audio/mpeg'},
+        timeout=TRANSCRIBE_SERVER_TIMEOUT
+    )
+    if response.status_code != 200:
+        logger.warning(f"Transcription daemon error: {response.status_code} {response.text[:200]}")
+        return None
+    result = response.json()
+    logger.info(f"Transcribed by daemon (queued {result.get('queue_ms')} ms, inference {result.get('inference_ms')} ms)")
+    return result.get('text')
+
+
+def transcribe_local(data):
+    """
+    Transcribe with the model in this process, on the calling thread. Raises
+    ImportError without openai-whisper. transcribe() bounds the callers to
+    WHISPER_WORKERS; the daemon calls it from its single inference thread.
+    """
+    model = get_model()
+    if TRANSCRIBE_IN_MEMORY:
+        try:
+            return model.transcribe(decode_audio(data))["text"].strip()
+        except (ImportError, OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"In-memory audio decode failed ({e}), using a temporary file")
+
+    fd, path = tempfile.mkstemp(suffix='.mp3')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return model.transcribe(path)["text"].strip()
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def transcribe(data):
+    """
+    Transcribe CAPTCHA audio (MP3 bytes). Returns the text, or None if no
+    transcriber is available or both failed. Blocks the calling thread.
+    """
+    # Try API first if key is available
+    api_key = os.getenv('OPENAI_API_KEY')
+    if api_key:
+        try:
+            text = _transcribe_api(data, api_key)
+            if text is not None:
+                return text
+        except Exception as e:
+            logger.warning(f"Whisper API failed: {e}, falling back to local")
+
+    if TRANSCRIBE_SERVER_URL:
+        try:
+            text = _transcribe_server(data)
+            if text is not None:
+                return text
+        except Exception as e:
+            logger.warning(f"Transcription daemon at {TRANSCRIBE_SERVER_URL} failed: {e}")
+        if not TRANSCRIBE_SERVER_FALLBACK:
+            return None
+
+    # Fall back to local Whisper
+    try:
+        logger.info("Using local Whisper model...")
+        return _executor.submit(transcribe_local, data).result()
+    except ImportError:
+        logger.error("⚠️ Whisper not available!")
+        logger.error("Install with: pip install openai-whisper")
+        logger.error("Or set OPENAI_API_KEY in environment")
+        return None
+    except Exception as e:
+        logger.error(f"Error with local Whisper: {e}")
+        return None
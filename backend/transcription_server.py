@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Local transcription daemon: one warm Whisper model for every scraper on the machine.
+
+Scrapers send CAPTCHA audio here when TRANSCRIBE_SERVER_URL is set (see
+transcription.py) instead of each loading a model next to its browsers.
+Requests are queued and handed, first come first served, to a single
+inference thread, so the model stays busy and loaded while the HTTP threads
+only wait.
+
+    python transcription_server.py
+    python transcription_server.py --port 8765
+    WHISPER_MODEL=stub WHISPER_STUB_TEXT=12345 python transcription_server.py
+
+    POST /transcribe   audio bytes -> {"text", "queue_ms", "inference_ms"}
+    GET  /stats        queue depth, throughput and latency percentiles
+    GET  /health
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import transcription
+
+logger = logging.getLogger(__name__)
+
+MAX_AUDIO_BYTES = 10 * 1024 * 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class TranscriptionQueue:
+    """
+    Audio waiting for the model, served in arrival order by one inference thread.
+
+    Whisper's transcribe() takes one clip at a time, so requests are not
+    batched: each is handed to transcription.transcribe_local() - the same
+    code the in-process path runs, so answers do not depend on where the
+    model lives - as soon as the thread is free.
+    """
+
+    def __init__(self, history=500):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.started_at = time.time()
+
+        self.processed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.in_flight = 0
+        self._queue_ms = deque(maxlen=history)
+        self._inference_ms = deque(maxlen=history)
+
+    def start(self, preload=True):
+        if preload:
+            # Pay for loading before the first CAPTCHA arrives
+            self._queue.put(None)
+        self._thread = threading.Thread(target=self._run, name='transcriber', daemon=True)
+        self._thread.start()
+
+    def submit(self, data, timeout=None):
+        """
+        Queue audio and wait for its transcription. Returns the result dict;
+        raises TimeoutError, ImportError (no model installed) or the model's error.
+        """
+        request = {
+            'data': data,
+            'queued_at': time.perf_counter(),
+            'done': threading.Event(),
+            'cancelled': False,
+        }
+        self._queue.put(request)
+        if not request['done'].wait(timeout):
+            request['cancelled'] = True
+            with self._lock:
+                self.timed_out += 1
+            raise TimeoutError(f"no transcription within {timeout}s")
+        if 'error' in request:
+            raise request['error']
+        return request['result']
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                try:
+                    transcription.get_model()
+                    logger.info(f"Model '{transcription.WHISPER_MODEL}' loaded, ready for requests")
+                except Exception as e:
+                    logger.error(f"Could not load model '{transcription.WHISPER_MODEL}': {e}")
+                continue
+            if request['cancelled']:
+                continue
+
+            with self._lock:
+                self.in_flight = 1
+            started = time.perf_counter()
+            try:
+                text = transcription.transcribe_local(request['data'])
+                request['result'] = {'text': text}
+            except Exception as e:
+                request['error'] = e
+            finished = time.perf_counter()
+
+            queue_ms = round((started - request['queued_at']) * 1000)
+            inference_ms = round((finished - started) * 1000)
+            with self._lock:
+                self.in_flight = 0
+                if 'error' in request:
+                    self.failed += 1
+                else:
+                    self.processed += 1
+                    self._queue_ms.append(queue_ms)
+                    self._inference_ms.append(inference_ms)
+            if 'result' in request:
+                request['result'].update(queue_ms=queue_ms, inference_ms=inference_ms)
+            request['done'].set()
+            logger.info(f"Transcribed in {inference_ms} ms after {queue_ms} ms queued ({self._queue.qsize()} waiting)")
+
+    def stats(self):
+        with self._lock:
+            queue_ms = list(self._queue_ms)
+            inference_ms = list(self._inference_ms)
+            return {
+                'model': transcription.WHISPER_MODEL,
+                'model_loaded': transcription._model is not None,
+                'queue_depth': self._queue.qsize(),
+                'in_flight': self.in_flight,
+                'processed': self.processed,
+                'failed': self.failed,
+                'timed_out': self.timed_out,
+                'queue_ms_p50': percentile(queue_ms, 0.5),
+                'queue_ms_p95': percentile(queue_ms, 0.95),
+                'inference_ms_p50': percentile(inference_ms, 0.5),
+                'inference_ms_p95': percentile(inference_ms, 0.95),
+                'uptime_s': round(time.time() - self.started_at),
+            }
+
+
+class TranscriptionHandler(BaseHTTPRequestHandler):
+    server_version = 'TranscriptionServer/1.0'
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self._send_json(200, self.server.transcriber.stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/transcribe':
+            self._send_json(404, {'error': 'not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            self._send_json(400, {'error': 'empty audio'})
+            return
+        if length > MAX_AUDIO_BYTES:
+            self._send_json(413, {'error': f'audio larger than {MAX_AUDIO_BYTES} bytes'})
+            return
+        data = self.rfile.read(length)
+
+        try:
+            result = self.server.transcriber.submit(data, timeout=self.server.request_timeout)
+        except TimeoutError as e:
+            self._send_json(504, {'error': str(e)})
+        except ImportError:
+            self._send_json(503, {'error': 'Whisper not installed on the transcription server (pip install openai-whisper)'})
+        except Exception as e:
+            logger.error(f"Transcription failed: {e}")
+            self._send_json(500, {'error': str(e)})
+        else:
+            self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def create_server(host='127.0.0.1', port=8765, transcriber=None, request_timeout=120):
+    """An HTTP server bound to host:port and backed by a started TranscriptionQueue"""
+    server = ThreadingHTTPServer((host, port), TranscriptionHandler)
+    server.daemon_threads = True
+    server.transcriber = transcriber or TranscriptionQueue()
+    server.request_timeout = request_timeout
+    if server.transcriber._thread is None:
+        server.transcriber.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.getenv('TRANSCRIBE_SERVER_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('TRANSCRIBE_SERVER_PORT', '8765')))
+    parser.add_argument('--timeout', type=float, default=float(os.getenv('TRANSCRIBE_SERVER_TIMEOUT', '120')),
+                        help='seconds a request may wait for its transcription')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    transcriber = TranscriptionQueue()
+    server = create_server(args.host, args.port, transcriber, args.timeout)
+    logger.info(f"Transcription server on http://{args.host}:{args.port} "
+                f"(model '{transcription.WHISPER_MODEL}')")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping transcription server")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
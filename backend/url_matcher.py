@@ -0,0 +1,102 @@
+import logging
+from bisect import bisect_left, bisect_right
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_url(url):
+    """
+    Normalize URL for comparison by removing trailing slashes, www, and fragments.
+    Keep the full path for accurate matching.
+    """
+    if not url:
+        return ""
+
+    try:
+        parsed = urlparse(url)
+        # Remove www. prefix
+        netloc = parsed.netloc.lower().replace('www.', '')
+        # Remove trailing slash from path
+        path = parsed.path.rstrip('/')
+        # Ignore fragments and query params for matching
+        return f"{netloc}{path}"
+    except:
+        return url.lower()
+
+
+def normalized_match(norm1, norm2):
+    """urls_match for URLs that are already normalized"""
+    # Exact match
+    if norm1 == norm2:
+        return True
+
+    # Check if one is a substring of the other (for URL variations)
+    # But only if they're very similar (> 80% match)
+    if norm1 and norm2:
+        # sorted() keeps the two apart when they have the same length (min/max would both return norm1)
+        shorter, longer = sorted((norm1, norm2), key=len)
+        if len(shorter) > 10 and shorter in longer:
+            similarity = len(shorter) / len(longer)
+            return similarity > 0.8
+
+    return False
+
+
+def urls_match(url1, url2):
+    """
+    Check if two URLs match using normalized comparison.
+    This ensures exact URL matching, not just domain matching.
+    """
+    return normalized_match(normalize_url(url1), normalize_url(url2))
+
+
+class UrlMatcher:
+    """
+    A set of target URLs, normalized once, that resolves whole result lists.
+
+    Exact matches are a dict lookup per result. The >80% substring rule can
+    only hold between URLs whose lengths are within a factor of 0.8, so each
+    result is compared only with targets in that length window (bisect over
+    targets sorted by length) instead of with every target. Resolves to the
+    same positions as calling urls_match(result, target) for every pair.
+    """
+
+    def __init__(self, target_urls):
+        self.targets = list(target_urls)
+        self.normalized = [normalize_url(url) for url in self.targets]
+        self._exact = {}  # normalized target -> [target index]
+        for index, norm in enumerate(self.normalized):
+            self._exact.setdefault(norm, []).append(index)
+        # Candidates for the substring rule: non-empty targets, shortest first
+        by_length = sorted((len(norm), index) for index, norm in enumerate(self.normalized) if norm)
+        self._lengths = [length for length, _ in by_length]
+        self._by_length = [index for _, index in by_length]
+
+    def __len__(self):
+        return len(self.targets)
+
+    def match(self, url, normalized=False):
+        """Indexes of every target matching url"""
+        norm = url if normalized else normalize_url(url)
+        matches = set(self._exact.get(norm, ()))
+        if norm and self._lengths:
+            # shorter / longer > 0.8 bounds the other URL's length to (0.8 * n, n / 0.8);
+            # the window is taken inclusive and normalized_match() has the final say
+            length = len(norm)
+            low = bisect_left(self._lengths, length * 0.8)
+            high = bisect_right(self._lengths, length / 0.8)
+            for index in self._by_length[low:high]:
+                if index not in matches and normalized_match(norm, self.normalized[index]):
+                    matches.add(index)
+        return sorted(matches)
+
+    def resolve(self, results):
+        """First 1-based position of each target in an ordered result list: {target index: position}"""
+        found = {}
+        for position, url in enumerate(results, 1):
+            if len(found) == len(self.targets):
+                break
+            for index in self.match(url):
+                found.setdefault(index, position)
+        return found
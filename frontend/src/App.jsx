@@ -7,6 +7,9 @@ import Login from './components/Login';
 // Backend deployed on Render
 const API_URL = import.meta.env.VITE_API_BASE_URL || '';
 
+// Keywords are fetched from /api/keywords in pages of this size
+const PAGE_SIZE = 200;
+
 const countryList = [
   { code: '', name: 'Global / Auto' },
   { code: 'us', name: 'United States' },
@@ -46,6 +49,10 @@ const RankTrackerDashboard = ({ token, setToken }) => {
   const [searchTerm, setSearchTerm] = useState('');
   const [clientNames, setClientNames] = useState([]);
   const [selectedClient, setSelectedClient] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalKeywords, setTotalKeywords] = useState(0);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [keywordProgress, setKeywordProgress] = useState({});
   const [newTrack, setNewTrack] = useState({
     keyword: '',
     url: '',
@@ -68,14 +75,96 @@ const RankTrackerDashboard = ({ token, setToken }) => {
   const [importErrors, setImportErrors] = useState([]);
   const navigate = useNavigate();
 
-  // Fetch keywords on mount
+  // Fetch client names on mount
   useEffect(() => {
     if (token) {
-      fetchKeywords();
       fetchClientNames();
     }
   }, [token]);
 
+  // Fetch keywords on mount and whenever the search changes; the server filters every
+  // keyword, not just the pages already loaded, so wait until typing pauses
+  useEffect(() => {
+    if (!token) return;
+    const timer = setTimeout(() => fetchKeywords(), searchTerm ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [token, searchTerm]);
+
+  // Live progress pushed by the backend as local scrapers work through the queue
+  useEffect(() => {
+    if (!token) return;
+    let source = null;
+    let retryTimer = null;
+    let lastEventId = null;
+    let stopped = false;
+
+    const setProgress = (ids, label) => {
+      setKeywordProgress(prev => {
+        const next = { ...prev };
+        ids.forEach(id => { next[id] = label; });
+        return next;
+      });
+    };
+
+    const listen = (name, handler) => {
+      source.addEventListener(name, e => {
+        if (e.lastEventId) lastEventId = e.lastEventId;
+        handler(JSON.parse(e.data));
+      });
+    };
+
+    // EventSource cannot send the Authorization header, so the stream is opened with a
+    // short-lived token that only works here; a fresh one is fetched for every connection
+    const connect = async () => {
+      let streamToken;
+      try {
+        const response = await axios.post(`${API_URL}/api/events/token`);
+        streamToken = response.data.token;
+      } catch (err) {
+        console.error('Could not open progress stream:', err);
+        if (!stopped) retryTimer = setTimeout(connect, 5000);
+        return;
+      }
+      if (stopped) return;
+
+      const params = new URLSearchParams({ token: streamToken });
+      if (lastEventId) params.set('last_event_id', lastEventId);
+      source = new EventSource(`${API_URL}/api/events?${params}`);
+
+      listen('queued', data => setProgress(data.keyword_ids, 'Queued'));
+      listen('started', data => setProgress([data.keyword_id], 'Scraping...'));
+      listen('page', data => {
+        setProgress([data.keyword_id], `Page ${data.page} (${data.results} results)`);
+      });
+      listen('finished', data => {
+        setKeywords(prev => prev.map(kw => (
+          kw.id === data.keyword_id
+            ? { ...kw, position: data.position, checked_at: data.checked_at || kw.checked_at }
+            : kw
+        )));
+        setKeywordProgress(prev => {
+          const next = { ...prev };
+          delete next[data.keyword_id];
+          return next;
+        });
+      });
+      source.onerror = () => {
+        // EventSource retries dropped connections on its own, but once the stream token
+        // has expired the retry is refused and the source closes: reconnect with a new one
+        if (source.readyState === EventSource.CLOSED && !stopped) {
+          retryTimer = setTimeout(connect, 3000);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [token]);
+
   const fetchClientNames = async () => {
     try {
       const response = await axios.get(`${API_URL}/api/client-names`);
@@ -89,12 +178,17 @@ const RankTrackerDashboard = ({ token, setToken }) => {
     setLoading(true);
     setError(null);
     try {
-      const params = {};
+      const params = { limit: PAGE_SIZE };
       if (clientName) {
         params.client_name = clientName;
       }
+      if (searchTerm.trim()) {
+        params.search = searchTerm.trim();
+      }
       const response = await axios.get(`${API_URL}/api/keywords`, { params });
       setKeywords(response.data.keywords || []);
+      setNextCursor(response.data.next_cursor || null);
+      setTotalKeywords(response.data.total ?? (response.data.keywords || []).length);
     } catch (err) {
       if (err.response && err.response.status === 401) {
         setToken(null);
@@ -109,6 +203,34 @@ const RankTrackerDashboard = ({ token, setToken }) => {
     }
   };
 
+  const loadMoreKeywords = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const params = { limit: PAGE_SIZE, cursor: nextCursor };
+      if (selectedClient) {
+        params.client_name = selectedClient;
+      }
+      if (searchTerm.trim()) {
+        params.search = searchTerm.trim();
+      }
+      const response = await axios.get(`${API_URL}/api/keywords`, { params });
+      setKeywords(prev => [...prev, ...(response.data.keywords || [])]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (err) {
+      if (err.response && err.response.status === 401) {
+        setToken(null);
+        localStorage.removeItem('token');
+        navigate('/login');
+      } else {
+        setError(err.message);
+        console.error('Error loading more keywords:', err);
+      }
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleAddTrack = async () => {
     if (!newTrack.keyword || !newTrack.url) {
       setError('Keyword and URL are required');
@@ -145,7 +267,6 @@ const RankTrackerDashboard = ({ token, setToken }) => {
       
       if (result.status === 'queued') {
         alert(`✅ Scraping started! ${result.total_keywords} keyword(s) queued for local processing with visible browser.\n\nResults will appear automatically when your local scraper processes them.`);
-        startPollingForResults();
       }
       
     } catch (err) {
@@ -172,7 +293,6 @@ const RankTrackerDashboard = ({ token, setToken }) => {
       
       if (result.status === 'queued') {
         alert(`✅ Scraping started for selected keyword!\n\nResults will appear automatically when your local scraper processes them.`);
-        startPollingForResults();
       }
       
     } catch (err) {
@@ -193,20 +313,6 @@ const RankTrackerDashboard = ({ token, setToken }) => {
     }
   };
 
-  const startPollingForResults = () => {
-    const pollInterval = setInterval(async () => {
-      try {
-        await fetchKeywords();
-      } catch (err) {
-        console.error('Error polling for results:', err);
-      }
-    }, 10000);
-
-    setTimeout(() => {
-      clearInterval(pollInterval);
-    }, 300000);
-  };
-
   const handleDelete = async (id) => {
     if (!confirm('Are you sure you want to delete this keyword?')) return;
 
@@ -490,8 +596,9 @@ const RankTrackerDashboard = ({ token, setToken }) => {
     }
   };
 
+  // The server already filtered by the search; this keeps the list in step while typing
   const filteredKeywords = keywords.filter(k => 
-    k.keyword.toLowerCase().includes(searchTerm.toLowerCase())
+    k.keyword.toLowerCase().includes(searchTerm.trim().toLowerCase())
   );
 
   return (
@@ -704,7 +811,7 @@ const RankTrackerDashboard = ({ token, setToken }) => {
               </button>
             </div>
             <div className="text-xs sm:text-sm text-gray-300 text-center sm:text-right">
-              Tracking {filteredKeywords.length} keyword{filteredKeywords.length !== 1 ? 's' : ''}
+              Tracking {totalKeywords} keyword{totalKeywords !== 1 ? 's' : ''}
             </div>
           </div>
         </div>
@@ -984,6 +1091,9 @@ const RankTrackerDashboard = ({ token, setToken }) => {
                               ) : (
                                 <span className="text-xs text-gray-500">Not checked</span>
                               )}
+                              {keywordProgress[item.id] && (
+                                <span className="text-xs text-yellow-400">{keywordProgress[item.id]}</span>
+                              )}
                             </div>
                             
                             <div className="flex items-center gap-2 text-xs text-gray-400">
@@ -1153,6 +1263,9 @@ const RankTrackerDashboard = ({ token, setToken }) => {
                             ) : (
                               <span className="text-sm text-gray-500">Not checked</span>
                             )}
+                            {keywordProgress[item.id] && (
+                              <div className="text-xs text-yellow-400 mt-1">{keywordProgress[item.id]}</div>
+                            )}
                           </td>
                           <td className="px-6 py-4">
                             <div className="flex items-center gap-1">
@@ -1203,6 +1316,17 @@ const RankTrackerDashboard = ({ token, setToken }) => {
                 </tbody>
               </table>
             </div>
+            {nextCursor && (
+              <div className="p-3 sm:p-4 text-center border-t border-gray-700">
+                <button
+                  onClick={loadMoreKeywords}
+                  disabled={loadingMore}
+                  className="px-4 py-2 bg-gray-700 text-gray-200 rounded-lg hover:bg-gray-600 transition-colors disabled:opacity-50 border border-gray-600 text-sm"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
             </>
           )}
         </div>